@@ -1,16 +1,35 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, Response, stream_with_context, session, make_response, g
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_mail import Mail, Message
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import ContentRange
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from config import Config
-from models import db, User, Project, ProjectMedia, Service, Testimonial, Contact, CompanyInfo, LuckyDrawSeries, LuckyDrawTicket, PaymentSettings, PropertyDocument, LuckyDrawSettings
+from models import db, User, Project, ProjectCategory, ProjectMedia, Service, Testimonial, Contact, CompanyInfo, LuckyDrawSeries, LuckyDrawTicket, LuckyDrawNumberPool, LuckyDrawPurchase, NotificationOutbox, PaymentScreenshot, MediaBlob, MediaChunk, MediaDerivative, UploadSession, UploadChunk, ReferralSummary, LuckyDrawRun, LuckyDrawRunTicket, PaymentSettings, PropertyDocument, LuckyDrawSettings, CacheVersion
 import os
 import random
 import string
 import base64
-from datetime import datetime
+import hashlib
+import csv
+import io
+import secrets
+import mimetypes
+import tempfile
+import time
+import threading
+from collections import Counter, OrderedDict, namedtuple
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from twilio.rest import Client
 
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None  # Image derivatives are skipped without Pillow
+
 app = Flask(__name__)
 app.config.from_object(Config)
 
@@ -48,14 +67,15 @@ def send_ticket_confirmation_email(ticket):
         # Skip if no email provided
         if not ticket.customer_email:
             print("ℹ️ No email provided for this ticket. Skipping email notification.")
-            return
+            return False
         
         # Check email configuration
-        if not app.config.get('MAIL_USERNAME'):
+        console_transport = app.config.get('NOTIFICATION_TRANSPORT') == 'console'
+        if not console_transport and not app.config.get('MAIL_USERNAME'):
             print("❌ ERROR: Email not configured. MAIL_USERNAME is missing.")
             raise ValueError("Email configuration missing: MAIL_USERNAME not set")
         
-        if not app.config.get('MAIL_PASSWORD'):
+        if not console_transport and not app.config.get('MAIL_PASSWORD'):
             print("❌ ERROR: Email not configured. MAIL_PASSWORD is missing.")
             raise ValueError("Email configuration missing: MAIL_PASSWORD not set")
         
@@ -65,7 +85,7 @@ def send_ticket_confirmation_email(ticket):
         print(f"📧 Mail username: {app.config.get('MAIL_USERNAME')}")
         print(f"📧 TLS enabled: {app.config.get('MAIL_USE_TLS')}")
         
-        company_info = CompanyInfo.query.first()
+        company_info = cached_settings(CompanyInfo)
         company_name = company_info.company_name if company_info else "Sri Shanmukha Harayanaraya Constructions"
         
         subject = f"Lucky Draw Ticket {ticket.ticket_number} - Confirmed!"
@@ -140,9 +160,14 @@ def send_ticket_confirmation_email(ticket):
             html=html_body
         )
         
+        if console_transport:
+            print(f"📧 [console] To: {ticket.customer_email} | Subject: {subject}")
+            return True
+        
         print(f"📧 Sending email via Flask-Mail...")
         mail.send(msg)
         print(f"✅ SUCCESS: Confirmation email sent to {ticket.customer_email}")
+        return True
         
     except Exception as e:
         print(f"❌ ERROR sending email: {type(e).__name__}: {str(e)}")
@@ -150,15 +175,22 @@ def send_ticket_confirmation_email(ticket):
         traceback.print_exc()
         raise
 
-def send_ticket_sms(ticket):
-    """Send SMS notification to customer after ticket purchase using Twilio"""
+def send_ticket_sms(ticket, event=None):
+    """Send SMS notification to customer about a ticket using Twilio.
+    
+    event ('purchased' or 'confirmed') picks the message, defaulting to the ticket's
+    current status. Returns False when SMS is not configured and raises on send errors
+    so the notification worker can retry.
+    """
     try:
+        console_transport = app.config.get('NOTIFICATION_TRANSPORT') == 'console'
+        
         # Check if Twilio is configured
-        if not twilio_client:
+        if not console_transport and not twilio_client:
             print("⚠️ Twilio not configured. Skipping SMS.")
             return False
         
-        if not app.config.get('TWILIO_PHONE_NUMBER'):
+        if not console_transport and not app.config.get('TWILIO_PHONE_NUMBER'):
             print("⚠️ TWILIO_PHONE_NUMBER not configured. Skipping SMS.")
             return False
         
@@ -177,11 +209,19 @@ def send_ticket_sms(ticket):
                 customer_phone = '+91' + customer_phone
         
         # Prepare SMS message (short for trial account limits)
-        if ticket.status == 'confirmed':
+        if (event or ticket.status) == 'confirmed':
             message_body = f"SSHC Lucky Draw CONFIRMED! Ticket: {ticket.ticket_number}, Series: {ticket.series.series_name}. Good luck!"
+        elif ticket.purchase and len(ticket.purchase.tickets) > 1:
+            # One message for a multi-ticket purchase
+            ticket_numbers = ', '.join(t.ticket_number for t in ticket.purchase.tickets)
+            message_body = f"SSHC Tickets {ticket_numbers} purchased. Awaiting confirmation."
         else:
             message_body = f"SSHC Ticket {ticket.ticket_number} purchased (Series {ticket.series.series_name}). Awaiting confirmation."
         
+        if console_transport:
+            print(f"📱 [console] To: {customer_phone} | {message_body}")
+            return True
+        
         # Send SMS via Twilio
         print(f"📱 Sending SMS via Twilio...")
         message = twilio_client.messages.create(
@@ -198,15 +238,981 @@ def send_ticket_sms(ticket):
         print(f"❌ ERROR sending SMS: {type(e).__name__}: {str(e)}")
         import traceback
         traceback.print_exc()
+        raise
+
+def queue_ticket_notifications(ticket, event):
+    """Add the SMS (and email on confirmation) for a ticket event to the outbox.
+    
+    Rows are added to the current session so they commit with the ticket change;
+    notification_worker.py does the actual sending.
+    """
+    db.session.add(NotificationOutbox(ticket=ticket, channel='sms', event=event))
+    if event == 'confirmed' and ticket.customer_email:
+        db.session.add(NotificationOutbox(ticket=ticket, channel='email', event=event))
+
+# Lucky Draw - Ticket number pool
+def format_ticket_number(series, number):
+    return f"{series.series_name}-{number:04d}"
+
+def parse_ticket_number(ticket_number):
+    """Return the numeric part of a ticket number like A-0001"""
+    return int(ticket_number.rsplit('-', 1)[1])
+
+def add_to_number_pool(series_id, numbers):
+    """Insert free ticket numbers for a series, each with a random shuffle key"""
+    rows = [{
+        'series_id': series_id,
+        'number': number,
+        'shuffle_key': random.randint(0, 2**31 - 1)
+    } for number in numbers]
+    if rows:
+        db.session.execute(db.insert(LuckyDrawNumberPool), rows)
+    return len(rows)
+
+def build_number_pool(series):
+    """Rebuild the free pool of a series from the ticket numbers already in use"""
+    used_numbers = set(
+        parse_ticket_number(ticket_number)
+        for (ticket_number,) in db.session.query(LuckyDrawTicket.ticket_number).filter_by(series_id=series.id)
+    )
+    LuckyDrawNumberPool.query.filter_by(series_id=series.id).delete(synchronize_session=False)
+    return add_to_number_pool(
+        series.id,
+        (num for num in range(1, series.total_tickets + 1) if num not in used_numbers)
+    )
+
+def resize_number_pool(series, old_total):
+    """Grow or shrink the free pool after total_tickets changed, returns the change in free numbers"""
+    if series.total_tickets > old_total:
+        return add_to_number_pool(series.id, range(old_total + 1, series.total_tickets + 1))
+    if series.total_tickets < old_total:
+        return -LuckyDrawNumberPool.query.filter(
+            LuckyDrawNumberPool.series_id == series.id,
+            LuckyDrawNumberPool.number > series.total_tickets
+        ).delete(synchronize_session=False)
+    return 0
+
+def claim_ticket_numbers(series_id, count):
+    """Atomically take up to count numbers from a series' shuffled pool, returns the numbers taken.
+    
+    Rows locked by concurrent buyers are skipped rather than waited on, so parallel
+    purchases never pick the same number and never queue behind each other.
+    """
+    next_free = db.select(LuckyDrawNumberPool.id).where(
+        LuckyDrawNumberPool.series_id == series_id
+    ).order_by(LuckyDrawNumberPool.shuffle_key).limit(count).with_for_update(skip_locked=True)
+    return db.session.execute(
+        db.delete(LuckyDrawNumberPool)
+        .where(LuckyDrawNumberPool.id.in_(next_free))
+        .returning(LuckyDrawNumberPool.number),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
+
+def release_ticket_number(ticket):
+    """Put a deleted ticket's number back into its series pool"""
+    if ticket.status == 'expired':
+        return  # Already returned when the reservation expired
+    number = parse_ticket_number(ticket.ticket_number)
+    if number <= ticket.series.total_tickets:
+        add_to_number_pool(ticket.series_id, [number])
+
+# Lucky Draw - Referral summary
+REFERRAL_STATUS_COLUMNS = {
+    'pending': 'pending_tickets',
+    'confirmed': 'confirmed_tickets',
+    'cancelled': 'cancelled_tickets',
+}
+
+def update_referral_summary(changes):
+    """Apply ticket status changes to referral_summary with one upsert.
+    
+    changes is an iterable of (refer_code, old_status, new_status, ticket_price);
+    old_status is None for a new ticket and new_status is None for a deleted one.
+    """
+    totals = {}
+    for refer_code, old_status, new_status, ticket_price in changes:
+        if not refer_code or old_status == new_status:
+            continue
+        row = totals.setdefault(refer_code, dict.fromkeys(
+            ['total_tickets', 'confirmed_revenue'] + list(REFERRAL_STATUS_COLUMNS.values()), 0))
+        if old_status is None:
+            row['total_tickets'] += 1
+        if new_status is None:
+            row['total_tickets'] -= 1
+        if old_status in REFERRAL_STATUS_COLUMNS:
+            row[REFERRAL_STATUS_COLUMNS[old_status]] -= 1
+        if new_status in REFERRAL_STATUS_COLUMNS:
+            row[REFERRAL_STATUS_COLUMNS[new_status]] += 1
+        if old_status == 'confirmed':
+            row['confirmed_revenue'] -= ticket_price or 0
+        if new_status == 'confirmed':
+            row['confirmed_revenue'] += ticket_price or 0
+    if not totals:
+        return
+    
+    # Sorted so concurrent upserts lock summary rows in the same order
+    stmt = pg_insert(ReferralSummary).values([
+        dict(refer_code=refer_code, updated_at=datetime.utcnow(), **row)
+        for refer_code, row in sorted(totals.items())
+    ])
+    counters = ['total_tickets', 'confirmed_revenue'] + list(REFERRAL_STATUS_COLUMNS.values())
+    set_ = {name: ReferralSummary.__table__.c[name] + stmt.excluded[name] for name in counters}
+    set_['updated_at'] = stmt.excluded.updated_at
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['refer_code'], set_=set_))
+
+def series_ticket_prices():
+    return dict(db.session.query(LuckyDrawSeries.id, LuckyDrawSeries.ticket_price).all())
+
+FROZEN_SERIES_MESSAGE = 'This series is frozen for a draw; its tickets can no longer change'
+
+# Lucky Draw - Reservation expiry
+def expire_stale_reservations(batch_size=None):
+    """Expire one batch of pending tickets older than RESERVATION_TTL_HOURS.
+    
+    Numbers go back to their series pool and available counts are restored with one
+    UPDATE per series. Rows locked by an admin action are skipped and picked up by a
+    later batch; tickets of series frozen for a draw are left as they are. Commits and
+    returns how many tickets were expired.
+    """
+    ttl_hours = app.config['RESERVATION_TTL_HOURS']
+    if ttl_hours <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    
+    stale = db.session.query(
+        LuckyDrawTicket.id, LuckyDrawTicket.series_id, LuckyDrawTicket.ticket_number, LuckyDrawTicket.refer_code
+    ).filter(
+        LuckyDrawTicket.status == 'pending',
+        LuckyDrawTicket.purchase_date < cutoff,
+        LuckyDrawTicket.series_id.in_(db.select(LuckyDrawSeries.id).where(LuckyDrawSeries.frozen_at.is_(None)))
+    ).order_by(LuckyDrawTicket.purchase_date, LuckyDrawTicket.id).limit(
+        batch_size or app.config['RESERVATION_SWEEP_BATCH_SIZE']
+    ).with_for_update(skip_locked=True).all()
+    # A draw may have frozen some of these series since the query above
+    open_series_ids = lock_open_series(row.series_id for row in stale)
+    stale = [row for row in stale if row.series_id in open_series_ids]
+    if not stale:
+        db.session.rollback()
+        return 0
+    
+    db.session.execute(
+        db.update(LuckyDrawTicket)
+        .where(LuckyDrawTicket.id.in_([row.id for row in stale]))
+        .values(status='expired'),
+        execution_options={'synchronize_session': False}
+    )
+    
+    totals = dict(db.session.query(LuckyDrawSeries.id, LuckyDrawSeries.total_tickets).all())
+    prices = series_ticket_prices()
+    numbers_per_series = {}
+    for row in stale:
+        number = parse_ticket_number(row.ticket_number)
+        if number <= totals.get(row.series_id, 0):
+            numbers_per_series.setdefault(row.series_id, []).append(number)
+    for series_id, numbers in sorted(numbers_per_series.items()):
+        add_to_number_pool(series_id, numbers)
+    
+    update_referral_summary(
+        (row.refer_code, 'pending', 'expired', prices.get(row.series_id)) for row in stale
+    )
+    
+    db.session.commit()
+    return len(stale)
+
+# Lucky Draw - Draw engine
+DRAW_CHUNK_SIZE = 5000
+
+def draw_seed_commitment(seed):
+    return hashlib.sha256(seed.encode('utf-8')).hexdigest()
+
+def draw_position(seed, index):
+    """Deterministic random integer for the index-th ticket, reproducible from the seed alone"""
+    return int(hashlib.sha256(f"{seed}:{index}".encode('utf-8')).hexdigest(), 16)
+
+def draw_seed_for(seed, tickets_digest):
+    """Seed the winners are drawn with: the committed seed mixed with the final ticket list.
+    
+    The ticket list is only known at draw time, so whoever knows the seed at commit time
+    still cannot tell which ticket positions will win.
+    """
+    return hashlib.sha256(f"{seed}:{tickets_digest}".encode('utf-8')).hexdigest()
+
+def digest_ticket_numbers(ticket_numbers):
+    """(ticket_count, SHA-256 of the ticket numbers in draw order, one per line)"""
+    digest = hashlib.sha256()
+    count = 0
+    for ticket_number in ticket_numbers:
+        digest.update(f"{ticket_number}\n".encode('utf-8'))
+        count += 1
+    return count, digest.hexdigest()
+
+def pick_winners(ticket_numbers, seed, winners_count):
+    """Reservoir sampling (Algorithm R) driven by SHA-256 of the seed and ticket position.
+    
+    Reads ticket_numbers once in any length using memory for winners_count tickets only.
+    Returns (winners, ticket_count, tickets_digest) where tickets_digest is the SHA-256
+    of the ticket numbers in draw order, one per line.
+    """
+    reservoir = []
+    digest = hashlib.sha256()
+    count = 0
+    for index, ticket_number in enumerate(ticket_numbers):
+        digest.update(f"{ticket_number}\n".encode('utf-8'))
+        count += 1
+        if index < winners_count:
+            reservoir.append(ticket_number)
+        else:
+            slot = draw_position(seed, index) % (index + 1)
+            if slot < winners_count:
+                reservoir[slot] = ticket_number
+    return reservoir, count, digest.hexdigest()
+
+def stream_run_ticket_numbers(run_id, chunk_size=DRAW_CHUNK_SIZE):
+    """Ticket numbers recorded for a drawn run, in draw order, via a server-side cursor"""
+    result = db.session.execute(
+        db.select(LuckyDrawRunTicket.ticket_number)
+        .where(LuckyDrawRunTicket.run_id == run_id)
+        .order_by(LuckyDrawRunTicket.position)
+        .execution_options(yield_per=chunk_size)
+    )
+    for ticket_number in result.scalars():
+        yield ticket_number
+
+def run_series_ids(run):
+    return [int(series_id) for series_id in run.series_ids.split(',')]
+
+def lock_open_series(series_ids):
+    """Key-share lock the given series and return the IDs not frozen for a draw.
+    
+    Call before changing a ticket's status. create_draw_run freezes series under
+    FOR UPDATE, so a ticket change either commits before the freeze or waits for it
+    and then sees the series frozen. KEY SHARE locks don't conflict with each other,
+    so concurrent purchases in one series don't queue behind one another.
+    """
+    series_ids = sorted(set(series_ids))
+    if not series_ids:
+        return set()
+    return set(db.session.scalars(
+        db.select(LuckyDrawSeries.id)
+        .where(LuckyDrawSeries.id.in_(series_ids), LuckyDrawSeries.frozen_at.is_(None))
+        .order_by(LuckyDrawSeries.id)
+        .with_for_update(read=True, key_share=True)
+    ).all())
+
+def create_draw_run(series_ids, winners_count):
+    """Commit to a fresh random seed for a future draw, publish run.seed_commitment.
+    
+    The series are frozen in the same transaction: they stop selling and their
+    tickets can no longer be confirmed, cancelled, expired or deleted, so the
+    ticket list the draw runs on is fixed once the commitment is published.
+    """
+    series_ids = sorted(set(series_ids))
+    series = LuckyDrawSeries.query.filter(LuckyDrawSeries.id.in_(series_ids)).order_by(
+        LuckyDrawSeries.id).with_for_update().all()
+    if len(series) != len(series_ids):
+        db.session.rollback()
+        raise ValueError("Unknown series")
+    frozen = [s.series_name for s in series if s.frozen_at]
+    if frozen:
+        db.session.rollback()
+        raise ValueError(f"Series {', '.join(frozen)} already belong to a draw")
+    
+    now = datetime.utcnow()
+    for s in series:
+        s.frozen_at = now
+        s.active = False
+    
+    seed = secrets.token_hex(32)
+    run = LuckyDrawRun(
+        series_ids=','.join(str(series_id) for series_id in series_ids),
+        winners_count=winners_count,
+        seed=seed,
+        seed_commitment=draw_seed_commitment(seed)
+    )
+    db.session.add(run)
+    db.session.commit()
+    return run
+
+def execute_draw(run):
+    """Draw the winners of a committed run and record the result on the run and its series.
+    
+    The confirmed tickets are copied into lucky_draw_run_tickets first; the published
+    ticket list and verify_draw read that copy, never the live tickets table.
+    """
+    # Locked and re-read, so a second click waits for the first and then finds it drawn
+    db.session.refresh(run, with_for_update=True)
+    if run.status != 'committed':
+        db.session.rollback()
+        raise ValueError(f"Draw {run.id} has already been drawn")
+    
+    series_ids = run_series_ids(run)
+    db.session.execute(
+        db.insert(LuckyDrawRunTicket).from_select(
+            ['run_id', 'position', 'ticket_number'],
+            db.select(
+                db.literal(run.id),
+                db.func.row_number().over(order_by=LuckyDrawTicket.ticket_number) - 1,
+                LuckyDrawTicket.ticket_number
+            ).where(LuckyDrawTicket.series_id.in_(series_ids), LuckyDrawTicket.status == 'confirmed')
+        )
+    )
+    ticket_count, tickets_digest = digest_ticket_numbers(stream_run_ticket_numbers(run.id))
+    if not ticket_count:
+        raise ValueError("No confirmed tickets to draw from")
+    draw_seed = draw_seed_for(run.seed, tickets_digest)
+    winners, _, _ = pick_winners(stream_run_ticket_numbers(run.id), draw_seed, run.winners_count)
+    
+    run.status = 'drawn'
+    run.drawn_at = datetime.utcnow()
+    run.draw_seed = draw_seed
+    run.ticket_count = ticket_count
+    run.tickets_digest = tickets_digest
+    run.winner_tickets = ','.join(winners)
+    
+    # First winner of each series is shown as that series' winner
+    for series in LuckyDrawSeries.query.filter(LuckyDrawSeries.id.in_(series_ids)).all():
+        series.active = False
+        series.draw_date = run.drawn_at
+        prefix = f"{series.series_name}-"
+        series_winner = next((ticket for ticket in winners if ticket.startswith(prefix)), None)
+        if series_winner:
+            series.winner_ticket = series_winner
+    
+    db.session.commit()
+    return winners
+
+def verify_draw(run):
+    """Re-run a drawn run from its published seed and ticket list; True if everything matches"""
+    ticket_count, tickets_digest = digest_ticket_numbers(stream_run_ticket_numbers(run.id))
+    # Draws run before the ticket list was mixed into the seed have no draw_seed
+    draw_seed = draw_seed_for(run.seed, tickets_digest) if run.draw_seed else run.seed
+    winners, _, _ = pick_winners(stream_run_ticket_numbers(run.id), draw_seed, run.winners_count)
+    return (draw_seed_commitment(run.seed) == run.seed_commitment
+            and ticket_count == run.ticket_count
+            and tickets_digest == run.tickets_digest
+            and (run.draw_seed is None or draw_seed == run.draw_seed)
+            and ','.join(winners) == run.winner_tickets)
+
+# CSV export
+EXPORT_CHUNK_SIZE = 1000
+
+def csv_safe(value):
+    """Stop spreadsheet apps from running customer-entered text as a formula"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, str) and value[:1] in ('=', '@', '+', '-') and not value.lstrip('+-').replace(' ', '').isdigit():
+        return "'" + value
+    return value
+
+def stream_csv(header, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a CSV document chunk by chunk, never holding more than chunk_size rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM so Excel reads the file as UTF-8
+    writer.writerow(header)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([csv_safe(value) for value in row])
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def csv_response(filename, header, statement):
+    """Stream the rows of a select statement as a CSV download through a server-side cursor"""
+    def generate():
+        result = db.session.execute(statement.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        yield from stream_csv(header, result)
+    
+    return Response(stream_with_context(generate()), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename={filename}'
+    })
+
+# Media store
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 3600  # Content never changes under a hash
+MEDIA_CHUNK_SIZE = 1024 * 1024  # Bytes per media_chunks row, and per read while streaming
+
+# Magic bytes checked before trusting the file extension
+MEDIA_SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (8, b'WEBP', 'image/webp'),
+    (0, b'%PDF-', 'application/pdf'),
+    (4, b'ftypqt', 'video/quicktime'),
+    (4, b'ftyp', 'video/mp4'),
+    (8, b'AVI ', 'video/x-msvideo'),
+    (0, b'\x1a\x45\xdf\xa3', 'video/webm'),  # Matroska/WebM
+]
+
+def upload_mime_type(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def sniff_mime_type(head, filename):
+    """Content type from the first bytes of a file, falling back to its extension"""
+    for offset, signature, mime_type in MEDIA_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type
+    return upload_mime_type(filename)
+
+def write_media_chunks(sha256, mime_type, size, stream, commit_every=None):
+    """Add content to the media store from a stream positioned at its start.
+    
+    Identical content shares one blob, so storing it again is a no-op. Rows are added
+    in the current transaction and commit with the record using them, unless
+    commit_every is given: then the transaction is committed after every that many
+    chunks, so a large file never sits in one long transaction. A blob left partly
+    written that way (the worker died) is completed by the next write of the same
+    content, which only adds the chunks still missing.
+    Returns True if the blob is new.
+    """
+    created = db.session.execute(
+        pg_insert(MediaBlob).values(sha256=sha256, mime_type=mime_type, size=size)
+        .on_conflict_do_nothing(index_elements=['sha256'])
+        .returning(MediaBlob.sha256)
+    ).scalar() is not None
+    seq = 0
+    if not created:
+        seq = db.session.scalar(
+            db.select(db.func.count()).select_from(MediaChunk).where(MediaChunk.sha256 == sha256)
+        )
+        if seq * MEDIA_CHUNK_SIZE >= size:
+            return False
+        stream.seek(seq * MEDIA_CHUNK_SIZE)
+    while True:
+        chunk = stream.read(MEDIA_CHUNK_SIZE)
+        if not chunk:
+            break
+        db.session.execute(
+            pg_insert(MediaChunk).values(sha256=sha256, seq=seq, data=chunk)
+            .on_conflict_do_nothing(index_elements=['sha256', 'seq'])
+        )
+        seq += 1
+        if commit_every and seq % commit_every == 0:
+            db.session.commit()
+    return created
+
+def store_media(data, mime_type):
+    """Save bytes already in memory (e.g. a rendered derivative), returns their SHA-256"""
+    sha256 = hashlib.sha256(data).hexdigest()
+    write_media_chunks(sha256, mime_type, len(data), io.BytesIO(data))
+    return sha256
+
+media_pool = ThreadPoolExecutor(max_workers=app.config['MEDIA_WORKERS'])  # Per-file upload work
+assembly_pool = ThreadPoolExecutor(max_workers=app.config['UPLOAD_ASSEMBLY_WORKERS'])  # Resumable uploads, kept off media_pool
+
+def spool_stream(stream, filename, destination=None):
+    """Read a file only once, MEDIA_CHUNK_SIZE at a time.
+    
+    The single pass hashes the content, sniffs its type from the first bytes and copies
+    it to destination (the local copy under static/uploads, if any) and to a spooled
+    temp file, so memory use stays at a couple of chunks whatever the file size.
+    Touches no database, so it can run in media_pool.
+    Returns (sha256, mime_type, size, spool); the caller closes the spool.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    head = b''
+    spool = tempfile.SpooledTemporaryFile(max_size=MEDIA_CHUNK_SIZE)
+    if destination:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+    local_copy = open(destination, 'wb') if destination else None
+    try:
+        while True:
+            chunk = stream.read(MEDIA_CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(head) < 32:
+                head += chunk[:32 - len(head)]
+            hasher.update(chunk)
+            size += len(chunk)
+            spool.write(chunk)
+            if local_copy:
+                local_copy.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    finally:
+        if local_copy:
+            local_copy.close()
+    
+    spool.seek(0)
+    return hasher.hexdigest(), sniff_mime_type(head, filename), size, spool
+
+def store_stream(stream, filename, destination=None):
+    """Add a file to the media store, written to media_chunks once its hash is known.
+    Returns (sha256, mime_type, created).
+    """
+    sha256, mime_type, size, spool = spool_stream(stream, filename, destination)
+    with spool:
+        created = write_media_chunks(sha256, mime_type, size, spool)
+    return sha256, mime_type, created
+
+def store_upload(file, destination=None):
+    """Store an uploaded (werkzeug FileStorage) file, returns its media hash"""
+    sha256, mime_type, created = store_stream(file.stream, file.filename, destination)
+    return sha256
+
+def hash_file(path, filename):
+    """Hash and sniff a file already on local disk, returns (sha256, mime_type, size)"""
+    hasher = hashlib.sha256()
+    size = 0
+    head = b''
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(MEDIA_CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(head) < 32:
+                head += chunk[:32 - len(head)]
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), sniff_mime_type(head, filename), size
+
+# Media store - Image derivatives
+DERIVATIVE_SOURCE_TYPES = {'image/jpeg', 'image/png', 'image/webp'}  # GIFs keep their animation
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+def render_derivatives(path, widths):
+    """Resize an image file to each width (never upscaling) as WebP and JPEG.
+    
+    Runs in media_pool, so it must not touch the database. Only pixel data is
+    re-encoded, which strips EXIF (camera, GPS) from every derivative.
+    Returns ((width, height) of the upright image, [(width, format, mime_type, data)]).
+    """
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)  # Apply the camera rotation before EXIF is dropped
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            flattened = Image.new('RGB', image.size, (255, 255, 255))
+            flattened.paste(image, mask=image.getchannel('A'))
+            image = flattened
+        else:
+            image = image.convert('RGB')
+    
+    derivatives = []
+    for width in widths:
+        target = min(width, image.width)
+        resized = image if target == image.width else image.resize(
+            (target, max(1, round(image.height * target / image.width))), Image.LANCZOS)
+        for fmt, (pil_format, mime_type, options) in DERIVATIVE_FORMATS.items():
+            output = io.BytesIO()
+            resized.save(output, pil_format, **options)
+            derivatives.append((width, fmt, mime_type, output.getvalue()))
+    return image.size, derivatives
+
+def try_render_derivatives(sha256, path):
+    """render_derivatives that logs and returns None instead of failing the upload"""
+    try:
+        return render_derivatives(path, app.config['IMAGE_DERIVATIVE_WIDTHS'])
+    except Exception as e:
+        print(f"⚠️ Could not create derivatives for {sha256[:12]}: {type(e).__name__}: {e}")
+        return None
+
+def store_derivatives(derivatives_by_source):
+    """Add rendered derivatives, {source sha256: render_derivatives() result}, to the media store
+    and record the source images' pixel sizes."""
+    rows = []
+    sizes = []
+    for sha256, rendered in derivatives_by_source.items():
+        if not rendered:
+            continue
+        (source_width, source_height), derivatives = rendered
+        sizes.append({'sha256': sha256, 'width': source_width, 'height': source_height})
+        for width, fmt, mime_type, data in derivatives:
+            rows.append({'source_hash': sha256, 'width': width, 'format': fmt,
+                         'blob_hash': store_media(data, mime_type)})
+    if sizes:
+        db.session.execute(db.update(MediaBlob), sizes)  # Bulk update by primary key
+    if rows:
+        db.session.execute(
+            pg_insert(MediaDerivative).values(rows)
+            .on_conflict_do_nothing(index_elements=['source_hash', 'width', 'format'])
+        )
+
+def add_image_derivatives(images):
+    """Render derivatives for {sha256: image path} in parallel and add them to the media store"""
+    if Image is None or not images:
+        return
+    futures = {sha256: media_pool.submit(try_render_derivatives, sha256, path)
+               for sha256, path in images.items()}
+    store_derivatives({sha256: future.result() for sha256, future in futures.items()})
+
+def prepare_upload(file, destination, kind=None):
+    """Per-file upload work for media_pool: copy, hash, check and (for images) resize.
+    
+    kind ('image' or 'video'), if given, is checked against the sniffed content type;
+    a file that doesn't match is dropped and (sha256, mime_type) come back as None.
+    """
+    sha256, mime_type, size, spool = spool_stream(file.stream, file.filename, destination)
+    if kind and not mime_type.startswith(f'{kind}/'):
+        spool.close()
+        os.remove(destination)
+        print(f"⚠️ Skipping {file.filename}: content is {mime_type}, not a {kind}")
+        return None, None, 0, None, None
+    derivatives = None
+    if destination and Image is not None and mime_type in DERIVATIVE_SOURCE_TYPES:
+        derivatives = try_render_derivatives(sha256, destination)
+    return sha256, mime_type, size, spool, derivatives
+
+def store_uploads(uploads):
+    """Store many uploads, doing the per-file work in parallel.
+    
+    uploads is a list of (file, destination, kind). Copying, hashing, type checks and
+    derivative rendering run in media_pool; the database writes then happen here, in
+    order, because the session belongs to this request thread.
+    Returns [(sha256, mime_type)], with (None, None) for files that failed the type check.
+    If any file fails, every spool is closed and the local copies are removed before
+    the error is raised.
+    """
+    futures = [media_pool.submit(prepare_upload, file, destination, kind)
+               for file, destination, kind in uploads]
+    # Wait for every file first, so a failure can't leave other workers' spools open
+    results = []
+    error = None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(None)
+            error = error or e
+    
+    try:
+        if error is not None:
+            raise error
+        stored = []
+        new_derivatives = {}
+        for sha256, mime_type, size, spool, derivatives in results:
+            if spool is not None:
+                if write_media_chunks(sha256, mime_type, size, spool) and derivatives:
+                    new_derivatives[sha256] = derivatives
+            stored.append((sha256, mime_type))
+        store_derivatives(new_derivatives)
+        return stored
+    except Exception:
+        for file, destination, kind in uploads:
+            if destination and os.path.exists(destination):
+                os.remove(destination)
+        raise
+    finally:
+        for result in results:
+            if result is not None and result[3] is not None:
+                result[3].close()
+
+def store_image_uploads(uploads):
+    """Store uploaded images with their resized derivatives, returns the media hashes in order.
+    
+    uploads is a list of (file, destination); derivatives are rendered from the local copy.
+    """
+    return [sha256 for sha256, mime_type in store_uploads(
+        [(file, destination, None) for file, destination in uploads])]
+
+@app.template_global()
+def media_url(sha256):
+    return url_for('media', sha256=sha256)
+
+def media_widths(hashes):
+    """{sha256: pixel width or None} of image blobs, read once per request"""
+    known = g.setdefault('media_widths', {})
+    missing = {sha256 for sha256 in hashes if sha256 and sha256 not in known}
+    if missing:
+        known.update(dict.fromkeys(missing))
+        known.update(db.session.execute(
+            db.select(MediaBlob.sha256, MediaBlob.width).where(MediaBlob.sha256.in_(missing))
+        ).all())
+    return known
+
+@app.template_global()
+def media_srcset(sha256, fmt):
+    """srcset value listing the derivative widths of an image.
+    
+    Derivatives are never upscaled, so widths above the image's own width are left out;
+    the first of them holds the full-size image and is listed under its real width.
+    Images rendered before widths were recorded list every width.
+    """
+    source_width = media_widths([sha256]).get(sha256)
+    entries = []
+    for width in sorted(app.config['IMAGE_DERIVATIVE_WIDTHS']):
+        url = url_for('media_derivative', sha256=sha256, width=width, fmt=fmt)
+        if source_width is not None and width >= source_width:
+            entries.append(f"{url} {source_width}w")
+            break
+        entries.append(f"{url} {width}w")
+    return ', '.join(entries)
+
+def is_media_hash(value):
+    return len(value) == 64 and all(ch in '0123456789abcdef' for ch in value)
+
+def iter_media_range(sha256, start, stop):
+    """Yield bytes start..stop-1 of a blob, reading only the chunks that cover them.
+    
+    Every chunk but the last is MEDIA_CHUNK_SIZE bytes, so positions map straight to
+    chunk numbers. A server-side cursor keeps one chunk in memory at a time.
+    """
+    if stop <= start:
+        return
+    rows = db.session.execute(
+        db.select(MediaChunk.seq, MediaChunk.data)
+        .where(MediaChunk.sha256 == sha256,
+               MediaChunk.seq.between(start // MEDIA_CHUNK_SIZE, (stop - 1) // MEDIA_CHUNK_SIZE))
+        .order_by(MediaChunk.seq),
+        execution_options={'yield_per': 1}
+    )
+    for seq, data in rows:
+        offset = seq * MEDIA_CHUNK_SIZE
+        yield data[max(start - offset, 0):stop - offset]
+
+def media_response(sha256, public=True, immutable=True):
+    """Serve a blob with ETag/Last-Modified validators and single byte-range support.
+    
+    Seeking in a video or PDF sends a Range request; only the chunks it covers are
+    read from the database and the reply is 206 Partial Content.
+    """
+    # The hash is the content, so a client that has it never needs it again
+    if sha256 in request.if_none_match:
+        response = Response(status=304)
+    else:
+        blob = db.session.get(MediaBlob, sha256)
+        if blob is None:
+            abort(404)
+        last_modified = blob.created_at.replace(microsecond=0, tzinfo=timezone.utc)
+        
+        byte_range = request.range
+        if_range = request.if_range
+        if byte_range and (len(byte_range.ranges) > 1
+                           or (if_range.etag and if_range.etag != sha256)
+                           or (if_range.date and if_range.date < last_modified)):
+            byte_range = None  # Multiple ranges or a changed validator: send the whole file
+        
+        if not request.if_none_match and request.if_modified_since \
+                and request.if_modified_since >= last_modified:
+            response = Response(status=304)
+        elif byte_range:
+            span = byte_range.range_for_length(blob.size)
+            if span is None:
+                response = Response(status=416)
+                response.headers['Content-Range'] = f'bytes */{blob.size}'
+            else:
+                start, stop = span
+                response = Response(stream_with_context(iter_media_range(sha256, start, stop)),
+                                    status=206, mimetype=blob.mime_type)
+                response.content_range = ContentRange('bytes', start, stop, blob.size)
+                response.content_length = stop - start
+        else:
+            response = Response(stream_with_context(iter_media_range(sha256, 0, blob.size)),
+                                mimetype=blob.mime_type)
+            response.content_length = blob.size
+        response.last_modified = last_modified
+    response.set_etag(sha256)
+    response.accept_ranges = 'bytes'
+    if not public:
+        response.cache_control.private = True
+        response.cache_control.max_age = 3600
+    elif immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = MEDIA_CACHE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+    return response
+
+@app.route('/media/<sha256>')
+def media(sha256):
+    if not is_media_hash(sha256):
+        abort(404)
+    return media_response(sha256)
+
+@app.route('/media/<sha256>/<int:width>.<fmt>')
+def media_derivative(sha256, width, fmt):
+    if not is_media_hash(sha256) or fmt not in DERIVATIVE_FORMATS \
+            or width not in app.config['IMAGE_DERIVATIVE_WIDTHS']:
+        abort(404)
+    derivative = MediaDerivative.query.filter_by(source_hash=sha256, width=width, format=fmt).first()
+    if derivative is None:
+        # Not rendered (GIF, older upload or no Pillow): serve the original, but not forever
+        return media_response(sha256, immutable=False)
+    return media_response(derivative.blob_hash)
+
+@app.route('/project/media/<int:id>/legacy')
+def legacy_project_media(id):
+    """Gallery file still stored as base64 in project_media (backfill_media_store.py has not
+    moved it yet), decoded on request"""
+    value = db.session.scalar(db.select(ProjectMedia.file_base64).where(ProjectMedia.id == id))
+    if not value:
+        abort(404)
+    header, encoded = value.split(',', 1) if value.startswith('data:') else ('', value)
+    data = base64.b64decode(encoded)
+    mime_type = header[len('data:'):].split(';', 1)[0] or sniff_mime_type(data[:32], '')
+    return Response(data, mimetype=mime_type, headers={'Cache-Control': 'public, max-age=3600'})
+
+def local_upload_exists(file_url):
+    """False for a /static/ file the ephemeral disk no longer has"""
+    if not file_url:
         return False
+    if not file_url.startswith('/static/'):
+        return True  # External URL
+    return os.path.exists(os.path.join(app.root_path, file_url.lstrip('/')))
+
+# Site settings cache
+# CompanyInfo, PaymentSettings and LuckyDrawSettings are single rows read by nearly every
+# public page and changed only from the admin settings pages. Each worker keeps an
+# immutable snapshot of them, and only asks the database whether anything changed (the
+# cache_versions table) once every CACHE_VERSION_CHECK_INTERVAL seconds.
+SETTINGS_MODELS = (CompanyInfo, PaymentSettings, LuckyDrawSettings)
+settings_snapshot_types = {
+    model: namedtuple(f'{model.__name__}Snapshot', [column.key for column in model.__table__.columns])
+    for model in SETTINGS_MODELS
+}
+settings_snapshots = {}  # model -> (settings version, snapshot or None)
+cache_version_state = {'versions': {}, 'checked_at': None}
+
+def cache_versions():
+    """{name: version} of the cached data sets, re-read at most once per check interval"""
+    now = time.monotonic()
+    checked_at = cache_version_state['checked_at']
+    if checked_at is None or now - checked_at >= app.config['CACHE_VERSION_CHECK_INTERVAL']:
+        cache_version_state['versions'] = dict(
+            db.session.execute(db.select(CacheVersion.name, CacheVersion.version)).all()
+        )
+        cache_version_state['checked_at'] = now
+    return cache_version_state['versions']
+
+def bump_cache_version(*names):
+    """Mark cached data as changed, in the current transaction, so every worker reloads it"""
+    for name in names:
+        db.session.execute(
+            pg_insert(CacheVersion).values(name=name, version=1, updated_at=datetime.utcnow())
+            .on_conflict_do_update(index_elements=['name'], set_={
+                'version': CacheVersion.version + 1,
+                'updated_at': datetime.utcnow()
+            })
+        )
+    cache_version_state['checked_at'] = None  # This worker re-reads on its next request
+
+def cached_settings(model):
+    """Snapshot of a settings row (None if there is none yet), normally without a query"""
+    version = cache_versions().get('settings', 0)
+    cached = settings_snapshots.get(model)
+    if cached is None or cached[0] != version:
+        row = model.query.first()
+        snapshot = settings_snapshot_types[model](
+            **{field: getattr(row, field) for field in settings_snapshot_types[model]._fields}
+        ) if row else None
+        cached = settings_snapshots[model] = (version, snapshot)
+    return cached[1]
+
+# Public page cache
+# Rendered public pages, kept per worker for anonymous visitors and keyed by path and
+# query string. Each entry remembers the cache_versions of the tags (project, service,
+# testimonial, settings) it was rendered from; the admin pages that change that data
+# bump the tags, so an entry is dropped within CACHE_VERSION_CHECK_INTERVAL seconds.
+page_cache = OrderedDict()  # key -> (tag versions, body, content type), least recently used first
+page_cache_state = {'bytes': 0}
+page_cache_lock = threading.Lock()
+
+def source_version():
+    """Newest modification time of app.py and the templates: the same in every worker of a
+    deploy (a per-worker start time would give each worker its own ETags)"""
+    paths = [os.path.abspath(__file__)]
+    for folder, _, names in os.walk(os.path.join(app.root_path, 'templates')):
+        paths.extend(os.path.join(folder, name) for name in names)
+    return str(int(max(os.path.getmtime(path) for path in paths)))
+
+# Changes with each deploy, so template changes also change the pages' ETags
+RELEASE_VERSION = os.environ.get('RENDER_GIT_COMMIT') or source_version()
+
+def tag_versions(tags):
+    versions = cache_versions()
+    return tuple(versions.get(tag, 0) for tag in tags)
+
+def fresh_render_required():
+    """Logged-in users and visitors with flash messages waiting get neither cached pages nor 304s"""
+    return current_user.is_authenticated or bool(session.get('_flashes'))
+
+def store_cached_page(key, stamp, body, content_type):
+    """Add a page, evicting the least recently used ones beyond PAGE_CACHE_MAX_BYTES"""
+    max_bytes = app.config['PAGE_CACHE_MAX_BYTES']
+    if len(body) > max_bytes:
+        return
+    with page_cache_lock:
+        old = page_cache.pop(key, None)
+        if old:
+            page_cache_state['bytes'] -= len(old[1])
+        page_cache[key] = (stamp, body, content_type)
+        page_cache_state['bytes'] += len(body)
+        while page_cache_state['bytes'] > max_bytes:
+            evicted_stamp, evicted_body, evicted_type = page_cache.popitem(last=False)[1]
+            page_cache_state['bytes'] -= len(evicted_body)
+
+def etag_page(*tags):
+    """Weak ETag for a public GET view, built from the versions of the data it shows.
+    
+    A matching If-None-Match is answered with 304 before the view runs, so nothing is
+    queried or rendered. Browsers are told to revalidate (no-cache) on each visit.
+    """
+    def decorator(view):
+        @wraps(view)
+        def conditional_view(*args, **kwargs):
+            if fresh_render_required():
+                return view(*args, **kwargs)
+            
+            version = ':'.join(map(str, (RELEASE_VERSION, request.endpoint) + tag_versions(tags)))
+            etag = hashlib.sha1(version.encode()).hexdigest()[:20]
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.cache_control.no_cache = True
+            return response
+        return conditional_view
+    return decorator
+
+def cache_page(*tags, query_args=()):
+    """Serve a public GET view from the page cache (and with an ETag, see etag_page).
+    
+    tags name the data the page shows; query_args are the query arguments the view reads.
+    Only those go into the cache key, so made-up query strings can't fill the cache.
+    Only 200 responses are stored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def cached_view(*args, **kwargs):
+            if fresh_render_required():
+                return view(*args, **kwargs)
+            
+            stamp = tag_versions(tags)
+            key = (request.path, tuple(request.args.get(name) for name in query_args))
+            with page_cache_lock:
+                entry = page_cache.get(key)
+                if entry and entry[0] == stamp:
+                    page_cache.move_to_end(key)
+                    return Response(entry[1], content_type=entry[2], headers={'X-Page-Cache': 'hit'})
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                store_cached_page(key, stamp, response.get_data(), response.content_type)
+                response.headers['X-Page-Cache'] = 'miss'
+            return response
+        return etag_page(*tags)(cached_view)
+    return decorator
 
 # Public Routes
 @app.route('/')
+@cache_page('project', 'service', 'testimonial', 'settings')
 def index():
-    company_info = CompanyInfo.query.first()
-    featured_projects = Project.query.filter_by(featured=True).limit(6).all()
+    company_info = cached_settings(CompanyInfo)
+    featured_projects = Project.query.options(db.defer(Project.description), db.defer(Project.image_base64)).filter_by(featured=True).limit(6).all()
     services = Service.query.filter_by(active=True).order_by(Service.order).all()
     testimonials = Testimonial.query.filter_by(active=True).limit(6).all()
+    media_widths([project.image_hash for project in featured_projects])  # One query for every srcset
     return render_template('index.html', 
                          company_info=company_info,
                          featured_projects=featured_projects,
@@ -214,43 +1220,145 @@ def index():
                          testimonials=testimonials)
 
 @app.route('/about')
+@cache_page('settings')
 def about():
-    company_info = CompanyInfo.query.first()
+    company_info = cached_settings(CompanyInfo)
     return render_template('about.html', company_info=company_info)
 
 @app.route('/services')
+@cache_page('service', 'settings')
 def services():
-    company_info = CompanyInfo.query.first()
+    company_info = cached_settings(CompanyInfo)
     services = Service.query.filter_by(active=True).order_by(Service.order).all()
+    media_widths([service.image_hash for service in services])  # One query for every srcset
     return render_template('services.html', company_info=company_info, services=services)
 
+PROJECTS_PER_PAGE = 12
+
 @app.route('/projects')
+@cache_page('project', 'settings', query_args=('category', 'after'))
 def projects():
-    company_info = CompanyInfo.query.first()
+    company_info = cached_settings(CompanyInfo)
     category = request.args.get('category', 'all')
-    if category == 'all':
-        projects = Project.query.order_by(Project.created_at.desc()).all()
-    else:
-        projects = Project.query.filter_by(category=category).order_by(Project.created_at.desc()).all()
     
-    categories = db.session.query(Project.category).distinct().all()
-    categories = [cat[0] for cat in categories]
+    # The listing shows neither the description nor (for migrated rows) the base64 image
+    query = Project.query.options(db.defer(Project.description), db.defer(Project.image_base64))
+    if category != 'all':
+        query = query.filter(Project.category == category)
+    
+    # Keyset pagination, newest first: continue after the (created_at, id) of the last card shown
+    cursor = request.args.get('after')
+    if cursor:
+        try:
+            created_at, last_id = cursor.rsplit('|', 1)
+            key = (datetime.fromisoformat(created_at), int(last_id))
+        except ValueError:
+            abort(400)
+        query = query.filter(db.tuple_(Project.created_at, Project.id) < key)
+    
+    # One extra row tells us whether there is a next page
+    projects = query.order_by(Project.created_at.desc(), Project.id.desc()).limit(PROJECTS_PER_PAGE + 1).all()
+    next_cursor = None
+    if len(projects) > PROJECTS_PER_PAGE:
+        projects = projects[:PROJECTS_PER_PAGE]
+        next_cursor = f"{projects[-1].created_at.isoformat()}|{projects[-1].id}"
+    
+    categories = ProjectCategory.query.filter(ProjectCategory.project_count > 0).order_by(ProjectCategory.category).all()
+    media_widths([project.image_hash for project in projects])  # One query for every srcset
     
     return render_template('projects.html', 
                          company_info=company_info,
                          projects=projects,
                          categories=categories,
-                         current_category=category)
+                         total_projects=sum(cat.project_count for cat in categories),
+                         current_category=category,
+                         is_first_page=not cursor,
+                         next_cursor=next_cursor)
 
 @app.route('/project/<int:id>')
+@cache_page('project', 'settings')
 def project_detail(id):
-    company_info = CompanyInfo.query.first()
-    project = Project.query.get_or_404(id)
-    return render_template('project_detail.html', company_info=company_info, project=project)
+    company_info = cached_settings(CompanyInfo)
+    project = Project.query.options(db.defer(Project.image_base64)).get_or_404(id)
+    # The gallery itself is loaded page by page from project_gallery as the visitor scrolls
+    media_counts = dict(db.session.execute(
+        db.select(ProjectMedia.file_type, db.func.count())
+        .where(ProjectMedia.project_id == id)
+        .group_by(ProjectMedia.file_type)
+    ).all())
+    return render_template('project_detail.html', company_info=company_info, project=project,
+                           image_count=media_counts.get('image', 0),
+                           video_count=media_counts.get('video', 0))
+
+GALLERY_PAGE_SIZE = 24
+
+@app.route('/project/<int:id>/gallery')
+@cache_page('project', query_args=('type', 'after'))
+def project_gallery(id):
+    """One page of a project's images (or ?type=video) as JSON: URLs and pixel sizes only.
+    
+    Keyset pagination in gallery order; pass next_cursor back as ?after= for the next page.
+    """
+    file_type = request.args.get('type', 'image')
+    if file_type not in ('image', 'video'):
+        abort(400)
+    if db.session.scalar(db.select(Project.id).where(Project.id == id)) is None:
+        abort(404)
+    
+    query = db.select(
+        ProjectMedia.id, ProjectMedia.order, ProjectMedia.file_url, ProjectMedia.file_hash,
+        ProjectMedia.file_base64.isnot(None).label('has_base64'),
+        MediaBlob.mime_type, MediaBlob.width, MediaBlob.height
+    ).outerjoin(MediaBlob, MediaBlob.sha256 == ProjectMedia.file_hash).where(
+        ProjectMedia.project_id == id,
+        ProjectMedia.file_type == file_type
+    )
+    cursor = request.args.get('after')
+    if cursor:
+        try:
+            last_order, last_id = (int(value) for value in cursor.split('|'))
+        except ValueError:
+            abort(400)
+        query = query.where(db.tuple_(ProjectMedia.order, ProjectMedia.id) > (last_order, last_id))
+    
+    # One extra row tells us whether there is a next page
+    rows = db.session.execute(
+        query.order_by(ProjectMedia.order, ProjectMedia.id).limit(GALLERY_PAGE_SIZE + 1)
+    ).all()
+    next_cursor = None
+    if len(rows) > GALLERY_PAGE_SIZE:
+        rows = rows[:GALLERY_PAGE_SIZE]
+        next_cursor = f"{rows[-1].order}|{rows[-1].id}"
+    
+    # The widths are already in the rows, media_srcset needn't look them up again
+    g.media_widths = {row.file_hash: row.width for row in rows if row.file_hash}
+    items = []
+    for row in rows:
+        if row.file_hash:
+            url = media_url(row.file_hash)
+        elif row.has_base64:
+            url = url_for('legacy_project_media', id=row.id)
+        elif local_upload_exists(row.file_url):
+            url = row.file_url
+        else:
+            continue  # Only ever saved to a disk that has since been wiped
+        item = {
+            'id': row.id,
+            'type': file_type,
+            'url': url,
+            'mime_type': row.mime_type,
+            'width': row.width,
+            'height': row.height,
+            'srcset': None
+        }
+        if file_type == 'image' and row.file_hash:
+            item['srcset'] = {fmt: media_srcset(row.file_hash, fmt) for fmt in DERIVATIVE_FORMATS}
+        items.append(item)
+    return jsonify({'items': items, 'next_cursor': next_cursor})
 
 @app.route('/contact', methods=['GET', 'POST'])
 def contact():
-    company_info = CompanyInfo.query.first()
+    company_info = cached_settings(CompanyInfo)
     if request.method == 'POST':
         contact = Contact(
             name=request.form['name'],
@@ -314,7 +1422,67 @@ def admin_dashboard():
                          testimonials_count=testimonials_count,
                          recent_contacts=recent_contacts)
 
+# Projects - Category facets
+def update_project_categories(changes):
+    """Apply project category changes to project_categories with one upsert.
+    
+    changes is an iterable of (old_category, new_category); old_category is None for a
+    new project and new_category is None for a deleted one.
+    """
+    deltas = Counter()
+    for old_category, new_category in changes:
+        if old_category == new_category:
+            continue
+        if old_category:
+            deltas[old_category] -= 1
+        if new_category:
+            deltas[new_category] += 1
+    deltas = {category: delta for category, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    
+    # Sorted so concurrent upserts lock category rows in the same order
+    stmt = pg_insert(ProjectCategory).values([
+        dict(category=category, project_count=delta, updated_at=datetime.utcnow())
+        for category, delta in sorted(deltas.items())
+    ])
+    db.session.execute(stmt.on_conflict_do_update(index_elements=['category'], set_={
+        'project_count': ProjectCategory.project_count + stmt.excluded.project_count,
+        'updated_at': stmt.excluded.updated_at
+    }))
+
 # Admin - Projects
+def add_project_media(project_id):
+    """Store the gallery images and videos posted with a project form.
+    
+    The per-file work runs in parallel (see store_uploads), then all ProjectMedia rows
+    are added with a single bulk insert. Returns how many were added.
+    """
+    uploads = []  # (file type, order, file, filename)
+    for file_type, field, allowed in (('image', 'images', allowed_file), ('video', 'videos', allowed_video)):
+        for idx, file in enumerate(request.files.getlist(field)):
+            if file and file.filename and allowed(file.filename):
+                filename = secure_filename(file.filename)
+                filename = f"{datetime.now().timestamp()}_{idx}_{filename}"
+                uploads.append((file_type, idx, file, filename))
+    if not uploads:
+        return 0
+    
+    stored = store_uploads([
+        (file, os.path.join(app.config['UPLOAD_FOLDER'], filename), file_type)
+        for file_type, idx, file, filename in uploads
+    ])
+    rows = [{
+        'project_id': project_id,
+        'file_url': f"/static/uploads/{filename}",
+        'file_hash': sha256,
+        'file_type': file_type,
+        'order': idx
+    } for (file_type, idx, file, filename), (sha256, mime_type) in zip(uploads, stored) if sha256]
+    if rows:
+        db.session.execute(db.insert(ProjectMedia), rows)
+    return len(rows)
+
 @app.route('/admin/projects')
 @login_required
 def admin_projects():
@@ -335,23 +1503,16 @@ def admin_add_project():
     if request.method == 'POST':
         # Handle main thumbnail image
         image_url = ''
-        image_base64 = ''
+        image_hash = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 filename = f"{datetime.now().timestamp()}_{filename}"
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
                 image_url = f"/static/uploads/{filename}"
                 
-                # Store base64 for persistence
-                file.seek(0)
-                image_data = file.read()
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                ext = filename.rsplit('.', 1)[1].lower()
-                mime_type = f'image/{ext}' if ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-                image_base64 = f'data:{mime_type};base64,{image_base64}'
+                # Local copy, persistent copy and resized derivatives, read in a single pass
+                image_hash = store_image_uploads([(file, os.path.join(app.config['UPLOAD_FOLDER'], filename))])[0]
         
         completion_date = None
         if request.form.get('completion_date'):
@@ -366,58 +1527,17 @@ def admin_add_project():
             client_name=request.form.get('client_name', ''),
             completion_date=completion_date,
             image_url=image_url,
-            image_base64=image_base64,
+            image_hash=image_hash,
             featured=bool(request.form.get('featured'))
         )
         db.session.add(project)
         db.session.flush()  # Get project ID
+        update_project_categories([(None, project.category)])
         
-        # Handle multiple additional images
-        if 'images' in request.files:
-            files = request.files.getlist('images')
-            for idx, file in enumerate(files):
-                if file and file.filename and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    filename = f"{datetime.now().timestamp()}_{idx}_{filename}"
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    file_url = f"/static/uploads/{filename}"
-                    
-                    # Store base64 for persistence
-                    file.seek(0)
-                    file_data = file.read()
-                    file_base64 = base64.b64encode(file_data).decode('utf-8')
-                    ext = filename.rsplit('.', 1)[1].lower()
-                    mime_type = f'image/{ext}' if ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-                    file_base64 = f'data:{mime_type};base64,{file_base64}'
-                    
-                    media = ProjectMedia(
-                        project_id=project.id,
-                        file_url=file_url,
-                        file_base64=file_base64,
-                        file_type='image',
-                        order=idx
-                    )
-                    db.session.add(media)
+        # Handle multiple additional images and videos
+        add_project_media(project.id)
         
-        # Handle multiple videos
-        if 'videos' in request.files:
-            files = request.files.getlist('videos')
-            for idx, file in enumerate(files):
-                if file and file.filename and allowed_video(file.filename):
-                    filename = secure_filename(file.filename)
-                    filename = f"{datetime.now().timestamp()}_{idx}_{filename}"
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    file_url = f"/static/uploads/{filename}"
-                    
-                    media = ProjectMedia(
-                        project_id=project.id,
-                        file_url=file_url,
-                        file_type='video',
-                        order=idx
-                    )
-                    db.session.add(media)
+        bump_cache_version('project')
         
         db.session.commit()
         flash('Project added successfully!', 'success')
@@ -435,6 +1555,7 @@ def admin_edit_project(id):
     project = Project.query.get_or_404(id)
     
     if request.method == 'POST':
+        update_project_categories([(project.category, request.form['category'])])
         project.title = request.form['title']
         project.description = request.form['description']
         project.category = request.form['category']
@@ -452,64 +1573,16 @@ def admin_edit_project(id):
             if file and file.filename and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 filename = f"{datetime.now().timestamp()}_{filename}"
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
                 project.image_url = f"/static/uploads/{filename}"
                 
-                # Store base64 for persistence
-                file.seek(0)
-                image_data = file.read()
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                ext = filename.rsplit('.', 1)[1].lower()
-                mime_type = f'image/{ext}' if ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-                project.image_base64 = f'data:{mime_type};base64,{image_base64}'
+                # Local copy, persistent copy and resized derivatives, read in a single pass
+                project.image_hash = store_image_uploads([(file, os.path.join(app.config['UPLOAD_FOLDER'], filename))])[0]
+                project.image_base64 = None
         
-        # Handle multiple additional images
-        if 'images' in request.files:
-            files = request.files.getlist('images')
-            for idx, file in enumerate(files):
-                if file and file.filename and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    filename = f"{datetime.now().timestamp()}_{idx}_{filename}"
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    file_url = f"/static/uploads/{filename}"
-                    
-                    # Store base64 for persistence
-                    file.seek(0)
-                    file_data = file.read()
-                    file_base64 = base64.b64encode(file_data).decode('utf-8')
-                    ext = filename.rsplit('.', 1)[1].lower()
-                    mime_type = f'image/{ext}' if ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-                    file_base64 = f'data:{mime_type};base64,{file_base64}'
-                    
-                    media = ProjectMedia(
-                        project_id=project.id,
-                        file_url=file_url,
-                        file_base64=file_base64,
-                        file_type='image',
-                        order=idx
-                    )
-                    db.session.add(media)
+        # Handle multiple additional images and videos
+        add_project_media(project.id)
         
-        # Handle multiple videos
-        if 'videos' in request.files:
-            files = request.files.getlist('videos')
-            for idx, file in enumerate(files):
-                if file and file.filename and allowed_video(file.filename):
-                    filename = secure_filename(file.filename)
-                    filename = f"{datetime.now().timestamp()}_{idx}_{filename}"
-                    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                    file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    file_url = f"/static/uploads/{filename}"
-                    
-                    media = ProjectMedia(
-                        project_id=project.id,
-                        file_url=file_url,
-                        file_type='video',
-                        order=idx
-                    )
-                    db.session.add(media)
+        bump_cache_version('project')
         
         db.session.commit()
         flash('Project updated successfully!', 'success')
@@ -524,7 +1597,9 @@ def admin_delete_project(id):
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
     project = Project.query.get_or_404(id)
+    update_project_categories([(project.category, None)])
     db.session.delete(project)
+    bump_cache_version('project')
     db.session.commit()
     flash('Project deleted successfully!', 'success')
     return jsonify({'success': True})
@@ -537,9 +1612,275 @@ def admin_delete_media(id):
     
     media = ProjectMedia.query.get_or_404(id)
     db.session.delete(media)
+    bump_cache_version('project')
     db.session.commit()
     return jsonify({'success': True})
 
+# Admin - Projects - Resumable video uploads
+# The browser creates a session, PUTs the file one chunk per request (any order, any
+# number of retries) and then asks for it to be assembled. Each request only handles
+# one chunk, and the hashing and database writes for the whole file run in assembly_pool
+# (not media_pool, which requests wait on while storing their own uploads), so a large video never holds a web worker for more than a chunk's worth of time.
+def resumable_upload_path(upload_id):
+    return os.path.join(app.config['RESUMABLE_UPLOAD_FOLDER'], f"{upload_id}.part")
+
+UPLOAD_LOST_MESSAGE = 'The partly uploaded file was lost when the server restarted, start the upload again'
+
+def resumable_upload_open(upload_id):
+    """SQL condition for an upload that may take chunks or be (re)assembled: still uploading,
+    failed, or stuck assembling for longer than RESUMABLE_UPLOAD_ASSEMBLY_TIMEOUT (the worker
+    died with a restart or deploy)"""
+    stale_before = datetime.utcnow() - timedelta(seconds=app.config['RESUMABLE_UPLOAD_ASSEMBLY_TIMEOUT'])
+    return db.and_(
+        UploadSession.id == upload_id,
+        db.or_(
+            UploadSession.status.in_(['uploading', 'failed']),
+            db.and_(UploadSession.status == 'assembling', UploadSession.updated_at < stale_before)
+        )
+    )
+
+def mark_upload_lost(upload_id, assembling=False):
+    """The disk was wiped under an open upload: mark it lost and forget its chunks so the
+    browser starts a new session. assembling=True is for the assembly worker itself.
+    Commits."""
+    if assembling:
+        condition = db.and_(UploadSession.id == upload_id, UploadSession.status == 'assembling')
+    else:
+        condition = resumable_upload_open(upload_id)
+    lost = db.session.execute(
+        db.update(UploadSession)
+        .where(condition)
+        .values(status='lost', error=UPLOAD_LOST_MESSAGE, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if lost:
+        db.session.execute(db.delete(UploadChunk).where(UploadChunk.upload_id == upload_id))
+        print(f"⚠️ Upload {upload_id}: {UPLOAD_LOST_MESSAGE}")
+    db.session.commit()
+
+def upload_lost_response():
+    return jsonify({'success': False, 'status': 'lost', 'message': UPLOAD_LOST_MESSAGE}), 410
+
+def upload_session_json(upload):
+    received = db.session.scalars(
+        db.select(UploadChunk.seq).where(UploadChunk.upload_id == upload.id).order_by(UploadChunk.seq)
+    ).all()
+    return {
+        'success': True,
+        'upload_id': upload.id,
+        'status': upload.status,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'chunk_count': upload.chunk_count,
+        'received': received,
+        'media_id': upload.media_id,
+        'error': upload.error
+    }
+
+def assemble_upload(upload_id):
+    """Turn a fully received upload into a ProjectMedia video; runs in assembly_pool.
+    
+    Uses its own app context (and so its own database session). The partial file is
+    hashed and written to the media store in place, then becomes the local copy under
+    static/uploads. On an unexpected error the session is marked failed with the
+    partial file kept, so completing it again retries the assembly; if the partial
+    file itself is gone the session is marked lost.
+    """
+    with app.app_context():
+        upload = db.session.get(UploadSession, upload_id)
+        if upload is None:
+            return  # Project deleted meanwhile
+        partial = resumable_upload_path(upload_id)
+        try:
+            sha256, mime_type, size = hash_file(partial, upload.filename)
+            if size != upload.size or not mime_type.startswith('video/'):
+                upload.status = 'rejected'
+                upload.error = f"Expected a {upload.size} byte video, got {size} bytes of {mime_type}"
+                db.session.execute(db.delete(UploadChunk).where(UploadChunk.upload_id == upload_id))
+                db.session.commit()
+                os.remove(partial)
+                print(f"⚠️ Rejected upload {upload_id}: {upload.error}")
+                return
+            
+            with open(partial, 'rb') as f:
+                write_media_chunks(sha256, mime_type, size, f,
+                                   commit_every=app.config['UPLOAD_ASSEMBLY_COMMIT_CHUNKS'])
+            
+            # A stuck assembly may have been queued again; only one of them adds the video
+            db.session.refresh(upload, with_for_update=True)
+            if upload.status != 'assembling':
+                db.session.rollback()
+                return
+            
+            filename = f"{datetime.now().timestamp()}_{secure_filename(upload.filename)}"
+            next_order = db.session.scalar(
+                db.select(db.func.coalesce(db.func.max(ProjectMedia.order), -1) + 1)
+                .where(ProjectMedia.project_id == upload.project_id)
+            )
+            media = ProjectMedia(
+                project_id=upload.project_id,
+                file_url=f"/static/uploads/{filename}",
+                file_hash=sha256,
+                file_type='video',
+                order=next_order
+            )
+            db.session.add(media)
+            db.session.flush()  # Get media ID
+            upload.status = 'complete'
+            upload.media_id = media.id
+            upload.error = None
+            db.session.execute(db.delete(UploadChunk).where(UploadChunk.upload_id == upload_id))
+            bump_cache_version('project')
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            upload = db.session.get(UploadSession, upload_id)
+            if upload is None or upload.status != 'assembling':
+                return  # Project deleted, or a requeued assembly finished first
+            if not os.path.exists(partial):
+                mark_upload_lost(upload_id, assembling=True)
+                return
+            upload.status = 'failed'
+            upload.error = f"{type(e).__name__}: {e}"
+            db.session.commit()
+            print(f"❌ Assembling upload {upload_id} failed: {upload.error}")
+            return
+        
+        # The video is already stored; the local copy is only a cache, so failing here is harmless
+        try:
+            os.replace(partial, os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        except OSError as e:
+            print(f"⚠️ Could not keep a local copy of upload {upload_id}: {e}")
+        print(f"✅ Upload {upload_id} assembled")
+
+@app.route('/admin/projects/<int:id>/uploads', methods=['POST'])
+@login_required
+def admin_create_upload(id):
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    project = Project.query.get_or_404(id)
+    data = request.get_json(silent=True) or {}
+    filename = (data.get('filename') or '').strip()
+    try:
+        size = int(data.get('size') or 0)
+    except (TypeError, ValueError):
+        size = 0
+    if not filename or not allowed_video(filename):
+        return jsonify({'success': False, 'message': 'Only MP4, AVI, MOV and WebM videos can be uploaded'}), 400
+    if size <= 0 or size > app.config['RESUMABLE_UPLOAD_MAX_SIZE']:
+        return jsonify({'success': False, 'message': 'Invalid file size'}), 400
+    
+    upload = UploadSession(
+        id=secrets.token_hex(16),
+        project_id=project.id,
+        filename=filename[:300],
+        size=size,
+        chunk_size=app.config['RESUMABLE_UPLOAD_CHUNK_SIZE']
+    )
+    os.makedirs(app.config['RESUMABLE_UPLOAD_FOLDER'], exist_ok=True)
+    with open(resumable_upload_path(upload.id), 'wb') as f:
+        f.truncate(size)  # Sparse file, chunks are written into place
+    db.session.add(upload)
+    db.session.commit()
+    return jsonify(upload_session_json(upload)), 201
+
+@app.route('/admin/uploads/<upload_id>')
+@login_required
+def admin_upload_status(upload_id):
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    if upload.status in ('uploading', 'failed') and not os.path.exists(resumable_upload_path(upload_id)):
+        mark_upload_lost(upload_id)
+        return upload_lost_response()
+    return jsonify(upload_session_json(upload))
+
+@app.route('/admin/uploads/<upload_id>/chunks/<int:seq>', methods=['PUT'])
+@login_required
+def admin_upload_chunk(upload_id, seq):
+    """Write one chunk into place. Sending a chunk again just rewrites the same bytes."""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    if upload.status == 'lost':
+        return upload_lost_response()
+    if upload.status not in ('uploading', 'failed'):
+        return jsonify({'success': False, 'message': f'Upload is {upload.status}'}), 409
+    if seq >= upload.chunk_count:
+        return jsonify({'success': False, 'message': 'No such chunk'}), 400
+    offset = seq * upload.chunk_size
+    expected = min(upload.chunk_size, upload.size - offset)
+    if request.content_length != expected:
+        return jsonify({'success': False, 'message': f'Chunk {seq} must be {expected} bytes'}), 400
+    
+    try:
+        fd = os.open(resumable_upload_path(upload_id), os.O_WRONLY)
+    except FileNotFoundError:
+        # Render's disk is wiped on every deploy and restart
+        mark_upload_lost(upload_id)
+        return upload_lost_response()
+    try:
+        end = offset + expected
+        while offset < end:
+            data = request.stream.read(min(MEDIA_CHUNK_SIZE, end - offset))
+            if not data:
+                break
+            while data:
+                written = os.pwrite(fd, data, offset)
+                offset += written
+                data = data[written:]
+    finally:
+        os.close(fd)
+    if offset != end:
+        return jsonify({'success': False, 'message': 'Chunk was cut short, send it again'}), 400
+    
+    db.session.execute(
+        pg_insert(UploadChunk).values(upload_id=upload_id, seq=seq)
+        .on_conflict_do_nothing(index_elements=['upload_id', 'seq'])
+    )
+    upload.updated_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify({'success': True, 'seq': seq})
+
+@app.route('/admin/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def admin_complete_upload(upload_id):
+    """Queue the assembly and return at once; call again to poll for the result.
+    
+    An assembly stuck for longer than RESUMABLE_UPLOAD_ASSEMBLY_TIMEOUT is queued again.
+    """
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    upload = UploadSession.query.get_or_404(upload_id)
+    if upload.status == 'lost':
+        return upload_lost_response()
+    restartable = db.session.scalar(db.select(db.exists().where(resumable_upload_open(upload_id))))
+    if restartable and not os.path.exists(resumable_upload_path(upload_id)):
+        mark_upload_lost(upload_id)
+        return upload_lost_response()
+    received = db.session.scalar(
+        db.select(db.func.count()).select_from(UploadChunk).where(UploadChunk.upload_id == upload_id)
+    )
+    if upload.status in ('uploading', 'failed') and received < upload.chunk_count:
+        return jsonify({'success': False, 'message': f'{upload.chunk_count - received} chunk(s) missing'}), 409
+    
+    # Only one request gets to start the assembly
+    started = db.session.execute(
+        db.update(UploadSession)
+        .where(resumable_upload_open(upload_id))
+        .values(status='assembling', updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.commit()
+    if started:
+        assembly_pool.submit(assemble_upload, upload_id)
+    db.session.refresh(upload)
+    return jsonify(upload_session_json(upload)), 202
+
 # Admin - Services
 @app.route('/admin/services')
 @login_required
@@ -560,35 +1901,28 @@ def admin_add_service():
     
     if request.method == 'POST':
         image_url = ''
-        image_base64 = ''
+        image_hash = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 filename = f"{datetime.now().timestamp()}_{filename}"
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
                 image_url = f"/static/uploads/{filename}"
                 
-                # Store base64 for persistence
-                file.seek(0)  # Reset file pointer
-                image_data = file.read()
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                # Get file extension for data URL
-                ext = filename.rsplit('.', 1)[1].lower()
-                mime_type = f'image/{ext}' if ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-                image_base64 = f'data:{mime_type};base64,{image_base64}'
+                # Local copy, persistent copy and resized derivatives, read in a single pass
+                image_hash = store_image_uploads([(file, os.path.join(app.config['UPLOAD_FOLDER'], filename))])[0]
         
         service = Service(
             title=request.form['title'],
             description=request.form['description'],
             icon=request.form.get('icon', 'fa-building'),
             image_url=image_url,
-            image_base64=image_base64,
+            image_hash=image_hash,
             order=int(request.form.get('order', 0)),
             active=bool(request.form.get('active', True))
         )
         db.session.add(service)
+        bump_cache_version('service')
         db.session.commit()
         flash('Service added successfully!', 'success')
         return redirect(url_for('admin_services'))
@@ -616,18 +1950,13 @@ def admin_edit_service(id):
             if file and file.filename and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 filename = f"{datetime.now().timestamp()}_{filename}"
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
                 service.image_url = f"/static/uploads/{filename}"
                 
-                # Store base64 for persistence
-                file.seek(0)  # Reset file pointer
-                image_data = file.read()
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                # Get file extension for data URL
-                ext = filename.rsplit('.', 1)[1].lower()
-                mime_type = f'image/{ext}' if ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-                service.image_base64 = f'data:{mime_type};base64,{image_base64}'
+                # Local copy, persistent copy and resized derivatives, read in a single pass
+                service.image_hash = store_image_uploads([(file, os.path.join(app.config['UPLOAD_FOLDER'], filename))])[0]
+                service.image_base64 = None
+        
+        bump_cache_version('service')
         
         db.session.commit()
         flash('Service updated successfully!', 'success')
@@ -643,6 +1972,7 @@ def admin_delete_service(id):
     
     service = Service.query.get_or_404(id)
     db.session.delete(service)
+    bump_cache_version('service')
     db.session.commit()
     flash('Service deleted successfully!', 'success')
     return jsonify({'success': True})
@@ -685,6 +2015,7 @@ def admin_add_testimonial():
             active=bool(request.form.get('active', True))
         )
         db.session.add(testimonial)
+        bump_cache_version('testimonial')
         db.session.commit()
         flash('Testimonial added successfully!', 'success')
         return redirect(url_for('admin_testimonials'))
@@ -716,6 +2047,8 @@ def admin_edit_testimonial(id):
                 file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
                 testimonial.image_url = f"/static/uploads/{filename}"
         
+        bump_cache_version('testimonial')
+        
         db.session.commit()
         flash('Testimonial updated successfully!', 'success')
         return redirect(url_for('admin_testimonials'))
@@ -730,6 +2063,7 @@ def admin_delete_testimonial(id):
     
     testimonial = Testimonial.query.get_or_404(id)
     db.session.delete(testimonial)
+    bump_cache_version('testimonial')
     db.session.commit()
     flash('Testimonial deleted successfully!', 'success')
     return jsonify({'success': True})
@@ -750,6 +2084,27 @@ def admin_contacts():
     
     return render_template('admin/contacts.html', contacts=contacts, current_status=status)
 
+@app.route('/admin/contacts/export.csv')
+@login_required
+def admin_export_contacts():
+    if not current_user.is_admin:
+        flash('Access denied', 'error')
+        return redirect(url_for('index'))
+    
+    statement = db.select(
+        Contact.id, Contact.name, Contact.email, Contact.phone,
+        Contact.subject, Contact.message, Contact.status, Contact.created_at
+    ).order_by(Contact.created_at.desc(), Contact.id.desc())
+    status = request.args.get('status', 'all')
+    if status != 'all':
+        statement = statement.where(Contact.status == status)
+    
+    return csv_response(
+        f"contacts_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+        ['ID', 'Name', 'Email', 'Phone', 'Subject', 'Message', 'Status', 'Date'],
+        statement
+    )
+
 @app.route('/admin/contacts/<int:id>/status', methods=['POST'])
 @login_required
 def admin_update_contact_status(id):
@@ -785,6 +2140,7 @@ def admin_settings():
     if not company_info:
         company_info = CompanyInfo()
         db.session.add(company_info)
+        bump_cache_version('settings')
         db.session.commit()
     
     if request.method == 'POST':
@@ -800,6 +2156,7 @@ def admin_settings():
         company_info.instagram = request.form.get('instagram', '')
         company_info.youtube = request.form.get('youtube', '')
         
+        bump_cache_version('settings')
         db.session.commit()
         flash('Settings updated successfully!', 'success')
         return redirect(url_for('admin_settings'))
@@ -808,12 +2165,13 @@ def admin_settings():
 
 # Lucky Draw - Public Routes
 @app.route('/lucky-draw')
+@etag_page('document', 'settings')
 def lucky_draw():
-    company_info = CompanyInfo.query.first()
+    company_info = cached_settings(CompanyInfo)
     active_series = LuckyDrawSeries.query.filter_by(active=True).all()
-    payment_settings = PaymentSettings.query.first()
+    payment_settings = cached_settings(PaymentSettings)
     documents = PropertyDocument.query.filter_by(active=True).order_by(PropertyDocument.order).all()
-    settings = LuckyDrawSettings.query.first()
+    settings = cached_settings(LuckyDrawSettings)
     if not settings:
         settings = LuckyDrawSettings(ticket_price=999)
     return render_template('lucky_draw.html', 
@@ -821,7 +2179,91 @@ def lucky_draw():
                          active_series=active_series, 
                          payment_settings=payment_settings,
                          documents=documents,
-                         settings=settings)
+                         settings=settings,
+                         max_tickets=app.config['MAX_TICKETS_PER_PURCHASE'])
+
+@app.route('/lucky-draw/draws/<int:id>')
+def lucky_draw_run(id):
+    """Public draw record; the seed and result are only shown once the draw has run"""
+    run = LuckyDrawRun.query.get_or_404(id)
+    data = {
+        'id': run.id,
+        'series': [name for (name,) in db.session.query(LuckyDrawSeries.series_name)
+                   .filter(LuckyDrawSeries.id.in_(run_series_ids(run))).order_by(LuckyDrawSeries.series_name)],
+        'winners_count': run.winners_count,
+        'seed_commitment': run.seed_commitment,
+        'status': run.status,
+        'algorithm': 'Confirmed ticket numbers when drawn (the series are frozen when the seed is committed) sorted '
+                     'ascending; draw seed = sha256("<seed>:<tickets_digest>"); reservoir sampling (Algorithm R) '
+                     'where ticket i (0-based) replaces slot int(sha256("<draw seed>:<i>"), 16) % (i + 1) if it is '
+                     'below winners_count',
+    }
+    if run.status == 'drawn':
+        data.update({
+            'seed': run.seed,
+            'draw_seed': run.draw_seed or run.seed,
+            'drawn_at': run.drawn_at.isoformat(),
+            'ticket_count': run.ticket_count,
+            'tickets_digest': run.tickets_digest,
+            'tickets_url': url_for('lucky_draw_run_tickets', id=run.id),
+            'winners': run.winner_tickets.split(','),
+        })
+    return jsonify(data)
+
+@app.route('/lucky-draw/draws/<int:id>/tickets.txt')
+def lucky_draw_run_tickets(id):
+    """Ticket numbers that took part in a draw, in draw order, streamed one per line"""
+    run = LuckyDrawRun.query.get_or_404(id)
+    if run.status != 'drawn':
+        abort(404)
+    
+    def generate():
+        for ticket_number in stream_run_ticket_numbers(run.id):
+            yield f"{ticket_number}\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/plain')
+
+def normalize_transaction_id(transaction_id):
+    """Transaction ID / UTR without case, spaces or punctuation, None if empty"""
+    return ''.join(ch for ch in (transaction_id or '').upper() if ch.isalnum())[:100] or None
+
+def find_purchase(purchase_token, transaction_key, customer_phone, customer_email):
+    """Earlier purchase with the same form token, or the same payment by the same buyer, if any.
+    
+    The form token is random, so matching it is proof enough. A transaction ID can be
+    guessed or mistyped, so a purchase found by it is only returned when one of its
+    tickets has the same phone number or email.
+    """
+    if purchase_token:
+        purchase = LuckyDrawPurchase.query.filter_by(purchase_token=purchase_token).first()
+        if purchase:
+            return purchase
+    if not transaction_key:
+        return None
+    same_buyer = []
+    if customer_phone and customer_phone.strip():
+        same_buyer.append(LuckyDrawTicket.customer_phone == customer_phone.strip())
+    if customer_email and customer_email.strip():
+        same_buyer.append(db.func.lower(LuckyDrawTicket.customer_email) == customer_email.strip().lower())
+    if not same_buyer:
+        return None
+    return LuckyDrawPurchase.query.filter(
+        LuckyDrawPurchase.transaction_key == transaction_key,
+        LuckyDrawPurchase.tickets.any(db.or_(*same_buyer))
+    ).first()
+
+def transaction_key_used(transaction_key):
+    """True if another buyer's purchase already has this transaction ID"""
+    return bool(transaction_key) and db.session.scalar(
+        db.select(db.exists().where(LuckyDrawPurchase.transaction_key == transaction_key))
+    )
+
+TRANSACTION_USED_MESSAGE = 'This transaction ID has already been used for another purchase. Please check it and try again.'
+
+def redirect_to_existing_purchase(purchase):
+    tickets = ', '.join(f'{ticket.ticket_number} ({ticket.status})' for ticket in purchase.tickets)
+    flash(f'We have already received this purchase. Your ticket(s): {tickets}', 'info')
+    return redirect(url_for('lucky_draw'))
 
 @app.route('/lucky-draw/purchase', methods=['POST'])
 def purchase_ticket():
@@ -830,96 +2272,120 @@ def purchase_ticket():
     customer_email = request.form['customer_email']
     customer_phone = request.form['customer_phone']
     customer_address = request.form.get('customer_address', '')
-    refer_code = request.form.get('refer_code', '')
+    refer_code = request.form.get('refer_code', '').strip()
     payment_method = request.form['payment_method']
     transaction_id = request.form.get('transaction_id', '')
+    purchase_token = request.form.get('purchase_token', '').strip()[:64] or None
+    quantity = request.form.get('quantity', 1, type=int)
+    if quantity < 1 or quantity > app.config['MAX_TICKETS_PER_PURCHASE']:
+        flash(f"You can buy between 1 and {app.config['MAX_TICKETS_PER_PURCHASE']} tickets at a time.", 'error')
+        return redirect(url_for('lucky_draw'))
+    transaction_key = normalize_transaction_id(transaction_id)
+    
+    # A resubmitted form (same token, or same payment and buyer) gets its original tickets back
+    existing_purchase = find_purchase(purchase_token, transaction_key, customer_phone, customer_email)
+    if existing_purchase:
+        return redirect_to_existing_purchase(existing_purchase)
+    if transaction_key_used(transaction_key):
+        flash(TRANSACTION_USED_MESSAGE, 'error')
+        return redirect(url_for('lucky_draw'))
     
     # Handle payment screenshot upload
     payment_screenshot = ''
-    payment_screenshot_base64 = ''
+    payment_screenshot_hash = None
     if 'payment_screenshot' in request.files:
         file = request.files['payment_screenshot']
-        print(f"DEBUG: File received: {file.filename if file else 'No file'}")
         if file and file.filename and allowed_file(file.filename):
             filename = secure_filename(file.filename)
             filename = f"payment_{datetime.now().timestamp()}_{filename}"
             upload_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            file.save(upload_path)
             payment_screenshot = f"/static/uploads/{filename}"
-            print(f"DEBUG: File saved at: {upload_path}")
-            print(f"DEBUG: Payment screenshot path: {payment_screenshot}")
             
-            # Store base64 for persistence
-            file.seek(0)  # Reset file pointer
-            image_data = file.read()
-            payment_screenshot_base64 = base64.b64encode(image_data).decode('utf-8')
-            # Get file extension for data URL
-            ext = filename.rsplit('.', 1)[1].lower()
-            mime_type = f'image/{ext}' if ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-            payment_screenshot_base64 = f'data:{mime_type};base64,{payment_screenshot_base64}'
-        else:
-            print(f"DEBUG: File validation failed or no filename")
-    else:
-        print("DEBUG: No payment_screenshot in request.files")
+            # Local copy and persistent media store copy are written in one pass
+            payment_screenshot_hash = store_upload(file, upload_path)
     
     # Get random available series (jumbled selection)
     available_series = LuckyDrawSeries.query.filter(
         LuckyDrawSeries.active == True,
+        LuckyDrawSeries.frozen_at.is_(None),
         LuckyDrawSeries.available_tickets > 0
     ).all()
+    # A draw committed since the query above freezes its series; they no longer sell
+    open_series_ids = lock_open_series(series.id for series in available_series)
+    available_series = [series for series in available_series if series.id in open_series_ids]
     
     if not available_series:
         flash('Sorry, no tickets available at the moment!', 'error')
         return redirect(url_for('lucky_draw'))
     
-    # Random selection from available series
-    selected_series = random.choice(available_series)
-    
-    # Generate random ticket number (jumbled system)
-    # Get all existing ticket numbers for this series
-    existing_tickets = LuckyDrawTicket.query.filter_by(series_id=selected_series.id).all()
-    used_numbers = set(int(ticket.ticket_number.split('-')[1]) for ticket in existing_tickets)
-    
-    # Generate a random ticket number from 1 to total_tickets that hasn't been used
-    available_numbers = [num for num in range(1, selected_series.total_tickets + 1) if num not in used_numbers]
-    
-    if not available_numbers:
-        flash('Sorry, no tickets available in the selected series!', 'error')
+    # Take numbers from the series in random order until the quantity is covered
+    random.shuffle(available_series)
+    claimed = []  # (series, number)
+    for series in available_series:
+        # Random ticket numbers from the series' pre-shuffled pool (jumbled system)
+        numbers = claim_ticket_numbers(series.id, quantity - len(claimed))
+        claimed.extend((series, number) for number in numbers)
+        if len(claimed) == quantity:
+            break
+    
+    if len(claimed) < quantity:
+        db.session.rollback()  # Give the claimed numbers back
+        if claimed:
+            flash(f'Sorry, only {len(claimed)} ticket(s) are available right now.', 'error')
+        else:
+            flash('Sorry, no tickets available in the selected series!', 'error')
         return redirect(url_for('lucky_draw'))
     
-    # Pick a random ticket number from available numbers
-    random_ticket_num = random.choice(available_numbers)
-    ticket_number = f"{selected_series.series_name}-{random_ticket_num:04d}"
-    
-    # Create ticket
-    ticket = LuckyDrawTicket(
-        ticket_number=ticket_number,
-        series_id=selected_series.id,
-        customer_name=customer_name,
-        customer_email=customer_email,
-        customer_phone=customer_phone,
-        customer_address=customer_address,
-        refer_code=refer_code,
-        payment_method=payment_method,
-        transaction_id=transaction_id,
-        payment_screenshot=payment_screenshot,
-        payment_screenshot_base64=payment_screenshot_base64,
-        status='pending'
-    )
-    
-    db.session.add(ticket)
-    selected_series.available_tickets -= 1
-    db.session.commit()
-    
-    # Send SMS notification to customer
     try:
-        send_ticket_sms(ticket)
-    except Exception as e:
-        print(f"Warning: SMS notification failed: {e}")
-        # Don't fail the purchase if SMS fails
+        # One purchase and one screenshot shared by every ticket
+        purchase = LuckyDrawPurchase(purchase_token=purchase_token, transaction_key=transaction_key)
+        db.session.add(purchase)
+        screenshot = None
+        if payment_screenshot_hash:
+            screenshot = PaymentScreenshot(image_hash=payment_screenshot_hash)
+            db.session.add(screenshot)
+        db.session.flush()
+        
+        ticket_numbers = [format_ticket_number(series, number) for series, number in claimed]
+        ticket_ids = db.session.execute(
+            db.insert(LuckyDrawTicket).returning(LuckyDrawTicket.id, sort_by_parameter_order=True),
+            [{
+                'purchase_id': purchase.id,
+                'ticket_number': ticket_number,
+                'series_id': series.id,
+                'customer_name': customer_name,
+                'customer_email': customer_email,
+                'customer_phone': customer_phone,
+                'customer_address': customer_address,
+                'refer_code': refer_code,
+                'payment_method': payment_method,
+                'transaction_id': transaction_id,
+                'payment_screenshot': payment_screenshot,
+                'payment_screenshot_id': screenshot.id if screenshot else None,
+                'status': 'pending'
+            } for ticket_number, (series, number) in zip(ticket_numbers, claimed)]
+        ).scalars().all()
+        
+        # A single SMS lists every ticket of the purchase
+        db.session.add(NotificationOutbox(ticket_id=ticket_ids[0], channel='sms', event='purchased'))
+        update_referral_summary([(refer_code, None, 'pending', series.ticket_price) for series, number in claimed])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # A concurrent duplicate submission won the race for the same token or payment
+        existing_purchase = find_purchase(purchase_token, transaction_key, customer_phone, customer_email)
+        if existing_purchase:
+            return redirect_to_existing_purchase(existing_purchase)
+        if transaction_key_used(transaction_key):
+            flash(TRANSACTION_USED_MESSAGE, 'error')
+            return redirect(url_for('lucky_draw'))
+        flash('Sorry, we could not reserve a ticket right now. Please try again.', 'error')
+        return redirect(url_for('lucky_draw'))
     
-    flash(f'Ticket {ticket_number} purchased successfully! You will receive an SMS confirmation shortly. Waiting for admin confirmation.', 'success')
+    if quantity == 1:
+        flash(f'Ticket {ticket_numbers[0]} purchased successfully! You will receive an SMS confirmation shortly. Waiting for admin confirmation.', 'success')
+    else:
+        flash(f'Tickets {", ".join(ticket_numbers)} purchased successfully! You will receive an SMS confirmation shortly. Waiting for admin confirmation.', 'success')
     return redirect(url_for('lucky_draw'))
 
 # Admin - Lucky Draw Management
@@ -944,11 +2410,12 @@ def admin_add_series():
         series = LuckyDrawSeries(
             series_name=request.form['series_name'].upper(),
             total_tickets=int(request.form['total_tickets']),
-            available_tickets=int(request.form['total_tickets']),
             ticket_price=int(request.form['ticket_price']),
             active=bool(request.form.get('active'))
         )
         db.session.add(series)
+        db.session.flush()  # Get series ID
+        add_to_number_pool(series.id, range(1, series.total_tickets + 1))
         db.session.commit()
         flash('Series added successfully!', 'success')
         return redirect(url_for('admin_lucky_draw'))
@@ -965,11 +2432,21 @@ def admin_edit_series(id):
     series = LuckyDrawSeries.query.get_or_404(id)
     
     if request.method == 'POST':
+        # Locked so a draw cannot freeze the series halfway through the edit
+        db.session.refresh(series, with_for_update=True)
+        if series.frozen_at:
+            db.session.rollback()
+            flash('This series belongs to a draw and can no longer be changed.', 'error')
+            return redirect(url_for('admin_lucky_draw'))
+        old_total = series.total_tickets
         series.series_name = request.form['series_name'].upper()
         series.total_tickets = int(request.form['total_tickets'])
         series.ticket_price = int(request.form['ticket_price'])
         series.active = bool(request.form.get('active'))
         
+        # Keep the free number pool in line with the new ticket range
+        resize_number_pool(series, old_total)
+        
         db.session.commit()
         flash('Series updated successfully!', 'success')
         return redirect(url_for('admin_lucky_draw'))
@@ -982,11 +2459,122 @@ def admin_delete_series(id):
     if not current_user.is_admin:
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
-    series = LuckyDrawSeries.query.get_or_404(id)
+    series = LuckyDrawSeries.query.filter_by(id=id).with_for_update().first_or_404()
+    if series.frozen_at:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'This series belongs to a draw and cannot be deleted'}), 400
     db.session.delete(series)
     db.session.commit()
     return jsonify({'success': True})
 
+@app.route('/admin/lucky-draw/draws')
+@login_required
+def admin_lucky_draw_draws():
+    if not current_user.is_admin:
+        flash('Access denied', 'error')
+        return redirect(url_for('index'))
+    
+    runs = LuckyDrawRun.query.order_by(LuckyDrawRun.created_at.desc()).all()
+    series = LuckyDrawSeries.query.order_by(LuckyDrawSeries.series_name).all()
+    series_names = {s.id: s.series_name for s in series}
+    return render_template('admin/lucky_draw_draws.html', runs=runs, series=series, series_names=series_names)
+
+@app.route('/admin/lucky-draw/draws/create', methods=['POST'])
+@login_required
+def admin_create_draw():
+    if not current_user.is_admin:
+        flash('Access denied', 'error')
+        return redirect(url_for('index'))
+    
+    series_ids = [int(series_id) for series_id in request.form.getlist('series_ids') if series_id.isdigit()]
+    winners_count = request.form.get('winners_count', 1, type=int)
+    if not series_ids or not winners_count or winners_count < 1:
+        flash('Select at least one series and a number of winners', 'error')
+        return redirect(url_for('admin_lucky_draw_draws'))
+    
+    try:
+        run = create_draw_run(series_ids, winners_count)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('admin_lucky_draw_draws'))
+    flash(f'Draw #{run.id} created and its series frozen. Publish the seed commitment before the draw: {run.seed_commitment}', 'success')
+    return redirect(url_for('admin_lucky_draw_draws'))
+
+@app.route('/admin/lucky-draw/draws/run/<int:id>', methods=['POST'])
+@login_required
+def admin_run_draw(id):
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    run = LuckyDrawRun.query.get_or_404(id)
+    try:
+        winners = execute_draw(run)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    flash(f'Draw #{run.id} complete! Winner(s): {", ".join(winners)}', 'success')
+    return jsonify({'success': True, 'winners': winners})
+
+TICKETS_PER_PAGE = 50
+TICKET_FILTERS = ['status', 'series', 'phone', 'refer', 'date_from', 'date_to']
+TICKET_SORTS = {
+    # sort name: (column, descending)
+    'newest': (LuckyDrawTicket.purchase_date, True),
+    'oldest': (LuckyDrawTicket.purchase_date, False),
+    'ticket': (LuckyDrawTicket.ticket_number, False),
+    'ticket_desc': (LuckyDrawTicket.ticket_number, True),
+}
+
+def parse_date_arg(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def filter_tickets_query(query, filters):
+    """Apply the admin ticket list filters (status, series, phone, refer, date range) to a query"""
+    if filters.get('status'):
+        query = query.filter(LuckyDrawTicket.status == filters['status'])
+    if filters.get('series', '').isdigit():
+        query = query.filter(LuckyDrawTicket.series_id == int(filters['series']))
+    if filters.get('phone'):
+        # Prefix match, served by the varchar_pattern_ops index
+        phone = filters['phone'].replace('%', '').replace('_', '')
+        query = query.filter(LuckyDrawTicket.customer_phone.like(f"{phone}%"))
+    if filters.get('refer'):
+        query = query.filter(LuckyDrawTicket.refer_code == filters['refer'])
+    date_from = parse_date_arg(filters.get('date_from'))
+    if date_from:
+        query = query.filter(LuckyDrawTicket.purchase_date >= date_from)
+    date_to = parse_date_arg(filters.get('date_to'))
+    if date_to:
+        query = query.filter(LuckyDrawTicket.purchase_date < date_to + timedelta(days=1))
+    return query
+
+def encode_ticket_cursor(ticket, sort):
+    column, _ = TICKET_SORTS[sort]
+    value = getattr(ticket, column.key)
+    value = value.isoformat() if isinstance(value, datetime) else value
+    return f"{value}|{ticket.id}"
+
+def apply_ticket_cursor(query, sort, cursor):
+    """Keyset pagination: continue after the (sort value, id) pair of the last row shown"""
+    column, descending = TICKET_SORTS[sort]
+    if cursor:
+        try:
+            value, last_id = cursor.rsplit('|', 1)
+            last_id = int(last_id)
+            if column is LuckyDrawTicket.purchase_date:
+                value = datetime.fromisoformat(value)
+        except ValueError:
+            abort(400)
+        key = db.tuple_(column, LuckyDrawTicket.id)
+        query = query.filter(key < (value, last_id) if descending else key > (value, last_id))
+    if descending:
+        return query.order_by(column.desc(), LuckyDrawTicket.id.desc())
+    return query.order_by(column.asc(), LuckyDrawTicket.id.asc())
+
 @app.route('/admin/lucky-draw/tickets')
 @login_required
 def admin_lucky_draw_tickets():
@@ -994,14 +2582,66 @@ def admin_lucky_draw_tickets():
         flash('Access denied', 'error')
         return redirect(url_for('index'))
     
-    status = request.args.get('status', '')
-    query = LuckyDrawTicket.query
-    
-    if status:
-        query = query.filter_by(status=status)
+    filters = {name: request.args.get(name, '').strip() for name in TICKET_FILTERS}
+    sort = request.args.get('sort', 'newest')
+    if sort not in TICKET_SORTS:
+        sort = 'newest'
+    
+    query = filter_tickets_query(LuckyDrawTicket.query, filters)
+    query = apply_ticket_cursor(query, sort, request.args.get('after'))
+    
+    # One extra row tells us whether there is a next page
+    tickets = query.limit(TICKETS_PER_PAGE + 1).all()
+    next_cursor = None
+    if len(tickets) > TICKETS_PER_PAGE:
+        tickets = tickets[:TICKETS_PER_PAGE]
+        next_cursor = encode_ticket_cursor(tickets[-1], sort)
+    
+    # Non-empty filters and sort, so links keep the current view
+    filter_args = {name: value for name, value in filters.items() if value}
+    if sort != 'newest':
+        filter_args['sort'] = sort
+    
+    series_list = db.session.query(LuckyDrawSeries.id, LuckyDrawSeries.series_name).order_by(LuckyDrawSeries.series_name).all()
+    
+    return render_template('admin/lucky_draw_tickets.html',
+                         tickets=tickets,
+                         current_status=filters['status'],
+                         filters=filters,
+                         filter_args=filter_args,
+                         sort=sort,
+                         series_list=series_list,
+                         is_first_page=not request.args.get('after'),
+                         next_cursor=next_cursor)
+
+@app.route('/admin/lucky-draw/tickets/export.csv')
+@login_required
+def admin_export_tickets():
+    if not current_user.is_admin:
+        flash('Access denied', 'error')
+        return redirect(url_for('index'))
     
-    tickets = query.order_by(LuckyDrawTicket.purchase_date.desc()).all()
-    return render_template('admin/lucky_draw_tickets.html', tickets=tickets, current_status=status)
+    filters = {name: request.args.get(name, '').strip() for name in TICKET_FILTERS}
+    sort = request.args.get('sort', 'newest')
+    if sort not in TICKET_SORTS:
+        sort = 'newest'
+    
+    # Same filters and order as the ticket list, without the screenshot
+    statement = db.select(
+        LuckyDrawTicket.ticket_number, LuckyDrawSeries.series_name, LuckyDrawTicket.status,
+        LuckyDrawTicket.customer_name, LuckyDrawTicket.customer_phone, LuckyDrawTicket.customer_email,
+        LuckyDrawTicket.customer_address, LuckyDrawTicket.refer_code, LuckyDrawTicket.payment_method,
+        LuckyDrawTicket.transaction_id, LuckyDrawSeries.ticket_price,
+        LuckyDrawTicket.purchase_date, LuckyDrawTicket.confirmed_date
+    ).join(LuckyDrawSeries, LuckyDrawSeries.id == LuckyDrawTicket.series_id)
+    statement = apply_ticket_cursor(filter_tickets_query(statement, filters), sort, None)
+    
+    return csv_response(
+        f"lucky_draw_tickets_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+        ['Ticket #', 'Series', 'Status', 'Customer', 'Phone', 'Email', 'Address', 'Refer Code',
+         'Payment Method', 'Transaction ID', 'Price', 'Purchase Date', 'Confirmed Date'],
+        statement
+    )
 
 @app.route('/admin/lucky-draw/tickets/confirm/<int:id>', methods=['POST'])
 @login_required
@@ -1010,33 +2650,37 @@ def admin_confirm_ticket(id):
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
     ticket = LuckyDrawTicket.query.get_or_404(id)
+    if not lock_open_series([ticket.series_id]):
+        return jsonify({'success': False, 'message': FROZEN_SERIES_MESSAGE}), 400
     
     print(f"🎫 Admin confirming ticket {ticket.ticket_number}")
     print(f"   Current status: {ticket.status}")
     print(f"   Customer phone: {ticket.customer_phone}")
     
-    ticket.status = 'confirmed'
-    ticket.confirmed_date = datetime.utcnow()
+    # Conditional update so the reservation sweeper or a cancel in between can't have
+    # this ticket's number sold twice
+    confirmed = db.session.execute(
+        db.update(LuckyDrawTicket)
+        .where(LuckyDrawTicket.id == ticket.id, LuckyDrawTicket.status == 'pending')
+        .values(status='confirmed', confirmed_date=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if confirmed != 1:
+        db.session.rollback()
+        db.session.refresh(ticket)
+        if ticket.status == 'expired':
+            # Its number may already belong to a new ticket
+            return jsonify({'success': False, 'message': 'This reservation has expired and its number was released'}), 400
+        return jsonify({'success': False, 'message': f'Only pending tickets can be confirmed (this one is {ticket.status})'}), 400
+    
+    update_referral_summary([(ticket.refer_code, 'pending', 'confirmed', ticket.series.ticket_price)])
+    # SMS and email are sent by the notification worker, not in this request
+    queue_ticket_notifications(ticket, 'confirmed')
     db.session.commit()
     
-    print(f"   New status: {ticket.status}")
+    print("   New status: confirmed")
     
-    # Send SMS notification (email removed to prevent worker timeout)
-    sms_sent = False
-    try:
-        print(f"📱 Attempting to send confirmation SMS...")
-        sms_sent = send_ticket_sms(ticket)
-        print(f"   SMS sent status: {sms_sent}")
-    except Exception as e:
-        print(f"❌ SMS sending failed with exception: {e}")
-        import traceback
-        traceback.print_exc()
-    
-    # Show success message
-    if sms_sent:
-        flash(f'Ticket {ticket.ticket_number} confirmed! SMS sent to {ticket.customer_phone}', 'success')
-    else:
-        flash(f'Ticket {ticket.ticket_number} confirmed! (SMS notification may have failed)', 'warning')
+    flash(f'Ticket {ticket.ticket_number} confirmed! SMS notification to {ticket.customer_phone} is queued', 'success')
     
     return jsonify({'success': True})
 
@@ -1047,15 +2691,105 @@ def admin_cancel_ticket(id):
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
     ticket = LuckyDrawTicket.query.get_or_404(id)
-    series = ticket.series
-    
-    ticket.status = 'cancelled'
-    series.available_tickets += 1  # Return ticket to pool
+    if not lock_open_series([ticket.series_id]):
+        return jsonify({'success': False, 'message': FROZEN_SERIES_MESSAGE}), 400
+    
+    # Conditional update so a double-click or a second admin can't return the ticket twice
+    cancelled = db.session.execute(
+        db.update(LuckyDrawTicket)
+        .where(LuckyDrawTicket.id == ticket.id, LuckyDrawTicket.status.in_(['pending', 'confirmed']))
+        .values(status='cancelled'),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if cancelled:
+        update_referral_summary([(ticket.refer_code, ticket.status, 'cancelled', ticket.series.ticket_price)])
     db.session.commit()
     
     flash(f'Ticket {ticket.ticket_number} cancelled successfully!', 'success')
     return jsonify({'success': True})
 
+@app.route('/admin/lucky-draw/tickets/bulk', methods=['POST'])
+@login_required
+def admin_bulk_update_tickets():
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    try:
+        ids = sorted(set(int(ticket_id) for ticket_id in data.get('ids', [])))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid ticket IDs'}), 400
+    
+    if action not in ['confirm', 'cancel']:
+        return jsonify({'success': False, 'message': 'Action must be confirm or cancel'}), 400
+    if not ids:
+        return jsonify({'success': False, 'message': 'No tickets selected'}), 400
+    
+    # Tickets of series frozen for a draw are left alone
+    open_series_ids = lock_open_series(db.session.scalars(
+        db.select(LuckyDrawTicket.series_id).where(LuckyDrawTicket.id.in_(ids)).distinct()
+    ).all())
+    
+    if action == 'confirm':
+        # One UPDATE for all pending tickets, then one bulk insert of their notifications
+        confirmed = db.session.execute(
+            db.update(LuckyDrawTicket)
+            .where(LuckyDrawTicket.id.in_(ids), LuckyDrawTicket.series_id.in_(open_series_ids),
+                   LuckyDrawTicket.status == 'pending')
+            .values(status='confirmed', confirmed_date=datetime.utcnow())
+            .returning(LuckyDrawTicket.id, LuckyDrawTicket.customer_email, LuckyDrawTicket.refer_code, LuckyDrawTicket.series_id),
+            execution_options={'synchronize_session': False}
+        ).all()
+        prices = series_ticket_prices()
+        update_referral_summary(
+            (refer_code, 'pending', 'confirmed', prices.get(series_id))
+            for _, _, refer_code, series_id in confirmed
+        )
+        notifications = []
+        for ticket_id, customer_email, _, _ in confirmed:
+            notifications.append({'ticket_id': ticket_id, 'channel': 'sms', 'event': 'confirmed'})
+            if customer_email:
+                notifications.append({'ticket_id': ticket_id, 'channel': 'email', 'event': 'confirmed'})
+        if notifications:
+            db.session.execute(db.insert(NotificationOutbox), notifications)
+        updated = len(confirmed)
+    else:
+        # Lock the rows first, their previous status is needed for the referral summary
+        cancelled = db.session.query(
+            LuckyDrawTicket.id, LuckyDrawTicket.series_id, LuckyDrawTicket.status, LuckyDrawTicket.refer_code
+        ).filter(
+            LuckyDrawTicket.id.in_(ids), LuckyDrawTicket.series_id.in_(open_series_ids),
+            LuckyDrawTicket.status.in_(['pending', 'confirmed'])
+        ).order_by(LuckyDrawTicket.id).with_for_update().all()
+        if cancelled:
+            db.session.execute(
+                db.update(LuckyDrawTicket)
+                .where(LuckyDrawTicket.id.in_([row.id for row in cancelled]))
+                .values(status='cancelled'),
+                execution_options={'synchronize_session': False}
+            )
+        prices = series_ticket_prices()
+        update_referral_summary(
+            (row.refer_code, row.status, 'cancelled', prices.get(row.series_id))
+            for row in cancelled
+        )
+        updated = len(cancelled)
+    
+    db.session.commit()
+    
+    skipped = len(ids) - updated
+    if action == 'confirm':
+        message = f'{updated} ticket(s) confirmed! SMS notifications are queued'
+        reason = 'not pending or frozen for a draw'
+    else:
+        message = f'{updated} ticket(s) cancelled successfully!'
+        reason = 'already cancelled, expired or frozen for a draw'
+    if skipped:
+        message += f' ({skipped} skipped: {reason})'
+    flash(message, 'success')
+    return jsonify({'success': True, 'updated': updated, 'skipped': skipped})
+
 @app.route('/admin/lucky-draw/tickets/delete/<int:id>', methods=['POST'])
 @login_required
 def admin_delete_ticket(id):
@@ -1063,19 +2797,59 @@ def admin_delete_ticket(id):
         return jsonify({'success': False, 'message': 'Access denied'}), 403
     
     ticket = LuckyDrawTicket.query.get_or_404(id)
-    series = ticket.series
+    if not lock_open_series([ticket.series_id]):
+        return jsonify({'success': False, 'message': FROZEN_SERIES_MESSAGE}), 400
     ticket_number = ticket.ticket_number
     
-    # Return ticket to available pool if it was confirmed or pending
-    if ticket.status in ['confirmed', 'pending']:
-        series.available_tickets += 1
-    
+    update_referral_summary([(ticket.refer_code, ticket.status, None, ticket.series.ticket_price)])
+    # The number is free again once the ticket row is gone
+    release_ticket_number(ticket)
     db.session.delete(ticket)
     db.session.commit()
     
     flash(f'Ticket {ticket_number} deleted successfully!', 'success')
     return jsonify({'success': True})
 
+REFERRAL_TICKETS_LIMIT = 100
+
+def referral_stats(refer_code):
+    """Counts by status, confirmed revenue and the latest tickets for one refer code"""
+    # Aggregated in the database from the (refer_code, status, series_id) index
+    rows = db.session.query(
+        LuckyDrawTicket.status,
+        db.func.count(LuckyDrawTicket.id),
+        db.func.sum(LuckyDrawSeries.ticket_price)
+    ).join(LuckyDrawSeries, LuckyDrawSeries.id == LuckyDrawTicket.series_id).filter(
+        LuckyDrawTicket.refer_code == refer_code
+    ).group_by(LuckyDrawTicket.status).all()
+    
+    stats = {'total': 0, 'pending': 0, 'confirmed': 0, 'cancelled': 0, 'revenue': 0}
+    for status, count, price_total in rows:
+        stats[status] = stats.get(status, 0) + count
+        stats['total'] += count
+        if status == 'confirmed':
+            stats['revenue'] = int(price_total or 0)
+    
+    tickets = db.session.query(
+        LuckyDrawTicket.ticket_number,
+        LuckyDrawTicket.customer_name,
+        LuckyDrawTicket.customer_phone,
+        LuckyDrawTicket.status,
+        LuckyDrawTicket.purchase_date
+    ).filter(LuckyDrawTicket.refer_code == refer_code).order_by(
+        LuckyDrawTicket.purchase_date.desc(), LuckyDrawTicket.id.desc()
+    ).limit(REFERRAL_TICKETS_LIMIT).all()
+    
+    tickets_data = [{
+        'ticket_number': ticket.ticket_number,
+        'customer_name': ticket.customer_name,
+        'customer_phone': ticket.customer_phone,
+        'status': ticket.status,
+        'purchase_date': ticket.purchase_date.strftime('%d %b %Y %H:%M')
+    } for ticket in tickets]
+    
+    return {'stats': stats, 'tickets': tickets_data}
+
 @app.route('/admin/lucky-draw/tickets/search-refer')
 @login_required
 def admin_search_refer():
@@ -1087,18 +2861,38 @@ def admin_search_refer():
     if not refer_code:
         return jsonify({'success': False, 'message': 'Referral code is required'}), 400
     
-    # Search for tickets with this refer code
-    tickets = LuckyDrawTicket.query.filter_by(refer_code=refer_code).order_by(LuckyDrawTicket.purchase_date.desc()).all()
-    
-    tickets_data = [{
-        'ticket_number': ticket.ticket_number,
-        'customer_name': ticket.customer_name,
-        'customer_phone': ticket.customer_phone,
-        'status': ticket.status,
-        'purchase_date': ticket.purchase_date.strftime('%d %b %Y %H:%M')
-    } for ticket in tickets]
+    return jsonify({'success': True, **referral_stats(refer_code)})
+
+@app.route('/admin/lucky-draw/referrals')
+@login_required
+def admin_referral_leaderboard():
+    if not current_user.is_admin:
+        flash('Access denied', 'error')
+        return redirect(url_for('index'))
     
-    return jsonify({'success': True, 'tickets': tickets_data})
+    page = request.args.get('page', 1, type=int)
+    leaderboard = ReferralSummary.query.order_by(
+        ReferralSummary.confirmed_tickets.desc(),
+        ReferralSummary.confirmed_revenue.desc(),
+        ReferralSummary.refer_code
+    ).paginate(page=page, per_page=50, error_out=False)
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'success': True,
+            'page': leaderboard.page,
+            'pages': leaderboard.pages,
+            'referrers': [{
+                'refer_code': row.refer_code,
+                'total': row.total_tickets,
+                'pending': row.pending_tickets,
+                'confirmed': row.confirmed_tickets,
+                'cancelled': row.cancelled_tickets,
+                'revenue': row.confirmed_revenue
+            } for row in leaderboard.items]
+        })
+    
+    return render_template('admin/lucky_draw_referrals.html', leaderboard=leaderboard)
 
 @app.route('/admin/lucky-draw/tickets/view/<int:id>')
 @login_required
@@ -1118,7 +2912,7 @@ def admin_view_ticket(id):
         'refer_code': ticket.refer_code,
         'payment_method': ticket.payment_method,
         'transaction_id': ticket.transaction_id,
-        'payment_screenshot': ticket.payment_screenshot_base64 if ticket.payment_screenshot_base64 else ticket.payment_screenshot,
+        'payment_screenshot': url_for('admin_ticket_screenshot', id=ticket.id) if ticket.payment_screenshot_id else ticket.payment_screenshot,
         'status': ticket.status,
         'purchase_date': ticket.purchase_date.strftime('%d %b %Y %H:%M'),
         'confirmed_date': ticket.confirmed_date.strftime('%d %b %Y %H:%M') if ticket.confirmed_date else None
@@ -1126,6 +2920,26 @@ def admin_view_ticket(id):
     
     return jsonify({'success': True, 'ticket': ticket_data})
 
+@app.route('/admin/lucky-draw/tickets/screenshot/<int:id>')
+@login_required
+def admin_ticket_screenshot(id):
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    ticket = LuckyDrawTicket.query.get_or_404(id)
+    if not ticket.screenshot:
+        abort(404)
+    
+    if ticket.screenshot.image_hash:
+        # Screenshots are private, so they aren't served from the public /media route
+        return media_response(ticket.screenshot.image_hash, public=False)
+    
+    # Stored as a data URI: data:<mime>;base64,<data>
+    header, encoded = ticket.screenshot.image_base64.split(',', 1)
+    mime_type = header[len('data:'):].split(';', 1)[0] or 'image/jpeg'
+    return Response(base64.b64decode(encoded), mimetype=mime_type,
+                    headers={'Cache-Control': 'private, max-age=3600'})
+
 @app.route('/admin/lucky-draw/property-documents')
 @login_required
 def admin_property_documents():
@@ -1160,28 +2974,21 @@ def admin_add_property_document():
         filename = secure_filename(file.filename)
         file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
         filename = f"property_doc_{datetime.now().timestamp()}_{filename}"
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
         
-        # Store base64 for images only (PDFs stay as file paths)
-        file_base64 = ''
-        if file_ext in ['jpg', 'jpeg', 'png', 'gif']:
-            file.seek(0)  # Reset file pointer
-            file_data = file.read()
-            file_base64 = base64.b64encode(file_data).decode('utf-8')
-            mime_type = f'image/{file_ext}' if file_ext in ['jpg', 'jpeg', 'png', 'gif'] else 'image/jpeg'
-            file_base64 = f'data:{mime_type};base64,{file_base64}'
+        # Local copy and persistent media store copy (images and PDFs) in one pass
+        file_hash = store_upload(file, file_path)
         
         document = PropertyDocument(
             title=title,
             description=description,
             file_url=f"/static/uploads/{filename}",
-            file_base64=file_base64,
+            file_hash=file_hash,
             file_type=file_ext,
             order=PropertyDocument.query.count()
         )
         db.session.add(document)
+        bump_cache_version('document')
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Document added successfully'})
@@ -1206,6 +3013,7 @@ def admin_delete_property_document(id):
                 print(f"Error deleting file: {e}")
     
     db.session.delete(document)
+    bump_cache_version('document')
     db.session.commit()
     
     return jsonify({'success': True})
@@ -1218,6 +3026,7 @@ def admin_toggle_property_document(id):
     
     document = PropertyDocument.query.get_or_404(id)
     document.active = not document.active
+    bump_cache_version('document')
     db.session.commit()
     
     return jsonify({'success': True, 'active': document.active})
@@ -1233,6 +3042,7 @@ def admin_lucky_draw_settings():
     if not settings:
         settings = LuckyDrawSettings()
         db.session.add(settings)
+        bump_cache_version('settings')
         db.session.commit()
     
     if request.method == 'POST':
@@ -1242,6 +3052,7 @@ def admin_lucky_draw_settings():
         settings.show_ticket_price = bool(request.form.get('show_ticket_price'))
         settings.prize_title = request.form.get('prize_title', '')
         settings.prize_description = request.form.get('prize_description', '')
+        bump_cache_version('settings')
         db.session.commit()
         
         flash('Lucky Draw settings updated successfully!', 'success')
@@ -1260,6 +3071,7 @@ def admin_payment_settings():
     if not payment_settings:
         payment_settings = PaymentSettings()
         db.session.add(payment_settings)
+        bump_cache_version('settings')
         db.session.commit()
     
     if request.method == 'POST':
@@ -1267,26 +3079,19 @@ def admin_payment_settings():
         payment_settings.payment_instructions = request.form.get('payment_instructions', '')
         payment_settings.lucky_draw_description = request.form.get('lucky_draw_description', '')
         
-        # Handle QR code upload - store as base64 for persistence across deployments
+        # Handle QR code upload - keep it in the media store for persistence across deployments
         if 'qr_code_image' in request.files:
             file = request.files['qr_code_image']
             if file and file.filename and allowed_file(file.filename):
-                # Read file and convert to base64
-                file_data = file.read()
-                file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else 'jpg'
-                mime_type = f"image/{file_ext if file_ext != 'jpg' else 'jpeg'}"
-                base64_data = base64.b64encode(file_data).decode('utf-8')
-                payment_settings.qr_code_base64 = f"data:{mime_type};base64,{base64_data}"
-                
                 # Also save to filesystem for backup (will be ephemeral on Render)
                 filename = secure_filename(file.filename)
                 filename = f"qr_{datetime.now().timestamp()}_{filename}"
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
                 file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                with open(file_path, 'wb') as f:
-                    f.write(file_data)
+                payment_settings.qr_code_hash = store_upload(file, file_path)
+                payment_settings.qr_code_base64 = None
                 payment_settings.qr_code_image = f"/static/uploads/{filename}"
         
+        bump_cache_version('settings')
         db.session.commit()
         flash('Payment settings updated successfully!', 'success')
         return redirect(url_for('admin_payment_settings'))
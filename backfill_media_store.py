@@ -0,0 +1,187 @@
+"""
+Media store backfill - moves base64 data URIs out of the database columns into media_blobs
+    python backfill_media_store.py                   # move everything, resuming where it stopped
+    python backfill_media_store.py --batch-size 20   # rows per batch (default 50)
+    python backfill_media_store.py --workers 2       # decoding processes (default: CPU count)
+    python backfill_media_store.py --restart         # ignore saved progress and rescan
+
+Each table is walked in id order, one batch per short transaction. Decoding and
+hashing run in a process pool, identical files are stored once, and the hash is
+written back while the base64 value is cleared. Progress is saved in
+media_backfill_progress in the same transaction as each batch, so the tool can be
+stopped or crash at any point and picks up after the last committed batch.
+
+Only rows that still have no hash are updated (an admin may have uploaded a new
+image meanwhile), and lucky_draw_tickets is only touched one batch of rows at a
+time, so ticket sales carry on while it runs.
+"""
+import io
+import os
+import sys
+import base64
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import text
+from app import (app, db, write_media_chunks, sniff_mime_type, add_image_derivatives,
+                 DERIVATIVE_SOURCE_TYPES)
+
+BATCH_SIZE = 50
+
+# (table, base64 column, hash column)
+SOURCES = [
+    ('projects', 'image_base64', 'image_hash'),
+    ('project_media', 'file_base64', 'file_hash'),
+    ('services', 'image_base64', 'image_hash'),
+    ('property_documents', 'file_base64', 'file_hash'),
+    ('payment_settings', 'qr_code_base64', 'qr_code_hash'),
+    ('payment_screenshots', 'image_base64', 'image_hash'),
+    # Tickets not yet handled by migrate_move_payment_screenshots.py get a payment_screenshots row
+    ('lucky_draw_tickets', 'payment_screenshot_base64', None),
+]
+
+def decode_data_uri(value):
+    """Decode a data URI (or bare base64) into (sha256, mime_type, data); runs in the process pool"""
+    header, encoded = value.split(',', 1) if value.startswith('data:') else ('', value)
+    data = base64.b64decode(encoded)
+    mime_type = sniff_mime_type(data[:32], '')
+    if mime_type == 'application/octet-stream' and header:
+        mime_type = header[len('data:'):].split(';', 1)[0] or mime_type
+    return hashlib.sha256(data).hexdigest(), mime_type, data
+
+def load_checkpoint(key):
+    last_id = db.session.execute(text(
+        "SELECT last_id FROM media_backfill_progress WHERE source = :source"
+    ), {'source': key}).scalar()
+    return last_id or 0
+
+def save_checkpoint(key, last_id, moved):
+    db.session.execute(text("""
+        INSERT INTO media_backfill_progress (source, last_id, moved, updated_at)
+        VALUES (:source, :last_id, :moved, now())
+        ON CONFLICT (source) DO UPDATE
+        SET last_id = EXCLUDED.last_id,
+            moved = media_backfill_progress.moved + EXCLUDED.moved,
+            updated_at = EXCLUDED.updated_at
+    """), {'source': key, 'last_id': last_id, 'moved': moved})
+
+def render_new_derivatives(images):
+    """Render srcset derivatives for newly stored images, from temporary files"""
+    paths = {}
+    try:
+        for sha256, data in images.items():
+            with tempfile.NamedTemporaryFile(delete=False) as image_file:
+                image_file.write(data)
+            paths[sha256] = image_file.name
+        add_image_derivatives(paths)
+    finally:
+        for path in paths.values():
+            os.remove(path)
+
+def write_references(table, base64_column, hash_column, hashes):
+    """Point rows at their media hashes and clear the base64 copies; hashes is {row id: sha256}"""
+    if not hashes:
+        return
+    if hash_column:
+        db.session.execute(text(f"""
+            UPDATE {table} SET {hash_column} = :sha256, {base64_column} = NULL
+            WHERE id = :id AND {hash_column} IS NULL
+        """), [{'id': row_id, 'sha256': sha256} for row_id, sha256 in hashes.items()])
+        return
+
+    # Tickets link to a payment_screenshots row, created only for a ticket still without one
+    # (locked, so a concurrent change can't leave an unused screenshot behind)
+    db.session.execute(text(f"""
+        WITH screenshot AS (
+            INSERT INTO payment_screenshots (image_hash, created_at)
+            SELECT :sha256, now() FROM lucky_draw_tickets
+            WHERE id = :id AND payment_screenshot_id IS NULL
+            FOR UPDATE
+            RETURNING id
+        )
+        UPDATE lucky_draw_tickets SET payment_screenshot_id = screenshot.id, {base64_column} = NULL
+        FROM screenshot
+        WHERE lucky_draw_tickets.id = :id
+    """), [{'id': ticket_id, 'sha256': sha256} for ticket_id, sha256 in hashes.items()])
+
+def backfill_source(pool, table, base64_column, hash_column, batch_size, restart):
+    key = f'{table}.{base64_column}'
+    columns = [col['name'] for col in db.inspect(db.engine).get_columns(table)]
+    if base64_column not in columns:
+        print(f"✓ {key}: no such column, skipping")
+        return 0
+
+    last_id = 0 if restart else load_checkpoint(key)
+    moved = 0
+    failed = []
+    while True:
+        rows = db.session.execute(text(f"""
+            SELECT id, {base64_column} FROM {table}
+            WHERE id > :last_id AND {base64_column} IS NOT NULL AND {base64_column} <> ''
+            ORDER BY id
+            LIMIT :batch_size
+        """), {'last_id': last_id, 'batch_size': batch_size}).all()
+        if not rows:
+            break
+
+        futures = [(row_id, pool.submit(decode_data_uri, value)) for row_id, value in rows]
+        hashes = {}
+        new_images = {}
+        for row_id, future in futures:
+            try:
+                sha256, mime_type, data = future.result()
+            except Exception as e:
+                failed.append(row_id)
+                print(f"⚠️ {key} #{row_id}: could not decode ({type(e).__name__}: {e})")
+                continue
+            if write_media_chunks(sha256, mime_type, len(data), io.BytesIO(data)) \
+                    and mime_type in DERIVATIVE_SOURCE_TYPES:
+                new_images[sha256] = data
+            hashes[row_id] = sha256
+
+        render_new_derivatives(new_images)
+        write_references(table, base64_column, hash_column, hashes)
+        last_id = rows[-1][0]
+        save_checkpoint(key, last_id, len(hashes))
+        db.session.commit()
+        db.session.expunge_all()
+        moved += len(hashes)
+        print(f"   {key}: moved {moved} (up to id {last_id})")
+
+    if failed:
+        print(f"⚠️ {key}: {len(failed)} row(s) left as base64: {', '.join(map(str, failed))}")
+    print(f"✅ {key}: {moved} value(s) moved")
+    return moved
+
+def main(args):
+    batch_size = int(args[args.index('--batch-size') + 1]) if '--batch-size' in args else BATCH_SIZE
+    workers = int(args[args.index('--workers') + 1]) if '--workers' in args else None
+    restart = '--restart' in args
+
+    with app.app_context():
+        db.session.execute(text("""
+            CREATE TABLE IF NOT EXISTS media_backfill_progress (
+                source VARCHAR(100) PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                moved INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP
+            )
+        """))
+        db.session.commit()
+
+        print("🔄 Moving base64 columns into the media store...")
+        total = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for table, base64_column, hash_column in SOURCES:
+                try:
+                    total += backfill_source(pool, table, base64_column, hash_column, batch_size, restart)
+                except Exception as e:
+                    print(f"❌ {table}.{base64_column} failed: {e}")
+                    db.session.rollback()
+                    import traceback
+                    traceback.print_exc()
+                    sys.exit(1)
+        print(f"🎉 Backfill complete, {total} value(s) moved")
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
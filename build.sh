@@ -27,5 +27,54 @@ python migrate_add_image_base64.py
 # Add show_ticket_price toggle and make ticket_price optional
 python migrate_add_price_toggle.py
 
+# Freeze lucky draw series once a draw commits to them, keep each draw's ticket list
+# (before the ticket pool migration, which reads lucky_draw_series)
+python migrate_freeze_draw_series.py
+
+# Add pre-shuffled free ticket number pool for each lucky draw series
+python migrate_add_ticket_pool.py
+
+# Add notification outbox table (drained by notification_worker.py)
+python migrate_add_notification_outbox.py
+
+# Move payment screenshots out of lucky_draw_tickets into payment_screenshots
+python migrate_move_payment_screenshots.py
+
+# Add indexes for the paginated admin ticket list
+python migrate_add_ticket_indexes.py
+
+# Add referral leaderboard summary table and refer_code index
+python migrate_add_referral_summary.py
+
+# Let expired reservations release their ticket numbers
+python migrate_reservation_expiry.py
+
+# Add lucky draw runs table (seeded, verifiable draws)
+python migrate_add_draw_runs.py
+
+# Add purchase records so retried purchase submissions aren't sold twice
+python migrate_add_purchase_idempotency.py
+
+# Add content-addressed media store for uploaded files
+python migrate_add_media_store.py
+
+# Add resized image derivatives (thumbnails, WebP) table
+python migrate_add_media_derivatives.py
+
+# Split media store content into chunks for streaming uploads and downloads
+python migrate_chunk_media_store.py
+
+# Add upload sessions for resumable, chunked video uploads
+python migrate_add_upload_sessions.py
+
+# Add cache version counters (site settings cache invalidation)
+python migrate_add_cache_versions.py
+
+# Add projects page indexes and per category project counts
+python migrate_add_project_listing_indexes.py
+
+# Add image sizes and the gallery index for the lazy-loaded project gallery
+python migrate_add_project_gallery.py
+
 # Initialize database tables (creates tables if they don't exist and seeds data)
 python init_db.py
@@ -16,6 +16,14 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 500 * 1024 * 1024  # 500MB max total upload size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
+    IMAGE_DERIVATIVE_WIDTHS = [320, 640, 960, 1600]  # srcset widths generated for uploaded images
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS') or min(4, os.cpu_count() or 1))  # Threads hashing and resizing uploads (cpu_count is the host's inside a container)
+    RESUMABLE_UPLOAD_FOLDER = os.path.join(UPLOAD_FOLDER, 'partial')  # Chunked uploads being received
+    RESUMABLE_UPLOAD_CHUNK_SIZE = int(os.environ.get('RESUMABLE_UPLOAD_CHUNK_SIZE') or 8 * 1024 * 1024)  # Bytes per request
+    RESUMABLE_UPLOAD_MAX_SIZE = int(os.environ.get('RESUMABLE_UPLOAD_MAX_SIZE') or 4 * 1024 * 1024 * 1024)  # 4GB per video
+    RESUMABLE_UPLOAD_ASSEMBLY_TIMEOUT = int(os.environ.get('RESUMABLE_UPLOAD_ASSEMBLY_TIMEOUT') or 30 * 60)  # Seconds before a stuck assembly is queued again
+    UPLOAD_ASSEMBLY_WORKERS = int(os.environ.get('UPLOAD_ASSEMBLY_WORKERS') or 1)  # Threads assembling resumable uploads, separate from MEDIA_WORKERS
+    UPLOAD_ASSEMBLY_COMMIT_CHUNKS = int(os.environ.get('UPLOAD_ASSEMBLY_COMMIT_CHUNKS') or 16)  # Media store chunks written per transaction while assembling
     
     # Admin Configuration
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL') or 'admin@sshcbuilders.com'
@@ -33,3 +41,21 @@ class Config:
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')  # Your Twilio phone number
+    
+    # Notification Outbox Configuration (drained by notification_worker.py)
+    NOTIFICATION_TRANSPORT = os.environ.get('NOTIFICATION_TRANSPORT') or 'live'  # live, or console to print instead of sending
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE') or 20)
+    NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS') or 5)
+    NOTIFICATION_RETRY_DELAY = int(os.environ.get('NOTIFICATION_RETRY_DELAY') or 30)  # Seconds, doubled after each failure
+    NOTIFICATION_POLL_INTERVAL = int(os.environ.get('NOTIFICATION_POLL_INTERVAL') or 5)  # Seconds between empty polls
+    NOTIFICATION_CLAIM_TIMEOUT = int(os.environ.get('NOTIFICATION_CLAIM_TIMEOUT') or 300)  # Seconds a worker has to send a claimed batch
+    
+    # Lucky Draw Reservation Configuration (expired by reservation_sweeper.py)
+    RESERVATION_TTL_HOURS = int(os.environ.get('RESERVATION_TTL_HOURS') or 72)  # Pending tickets older than this expire, 0 disables
+    RESERVATION_SWEEP_BATCH_SIZE = int(os.environ.get('RESERVATION_SWEEP_BATCH_SIZE') or 500)
+    RESERVATION_SWEEP_INTERVAL = int(os.environ.get('RESERVATION_SWEEP_INTERVAL') or 600)  # Seconds between sweeps
+    MAX_TICKETS_PER_PURCHASE = int(os.environ.get('MAX_TICKETS_PER_PURCHASE') or 10)
+    
+    # Cache Configuration
+    CACHE_VERSION_CHECK_INTERVAL = int(os.environ.get('CACHE_VERSION_CHECK_INTERVAL') or 5)  # Seconds a worker trusts its cached settings
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES') or 32 * 1024 * 1024)  # Rendered public pages kept per worker
@@ -0,0 +1,209 @@
+"""
+Upload garbage collector - deletes uploads nothing refers to any more
+    python gc_uploads.py                   # delete orphans older than 24 hours
+    python gc_uploads.py --dry-run         # only report what would be deleted
+    python gc_uploads.py --grace-hours 72  # keep anything newer than this
+
+Cleans up four things left behind by deleted or replaced projects, media, services,
+documents and tickets:
+  - files in UPLOAD_FOLDER (static/uploads) that no row points at
+  - payment_screenshots rows no ticket points at
+  - media_blobs (with their chunks and derivatives) that no row points at
+  - resumable upload sessions untouched for the grace period, with their partial files
+Anything newer than the grace period is kept, so uploads still being saved are safe.
+A blob that gets reused while the GC runs is protected by its foreign keys: its
+delete fails inside a savepoint and the blob is left for the next run.
+Dotfiles in UPLOAD_FOLDER (.gitkeep) are never touched.
+"""
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import IntegrityError
+from app import app, db, resumable_upload_path
+from models import (Project, ProjectMedia, Service, Testimonial, LuckyDrawTicket, PaymentSettings,
+                    PropertyDocument, PaymentScreenshot, MediaBlob, MediaDerivative, UploadSession)
+
+GRACE_HOURS = 24
+DELETE_BATCH_SIZE = 500
+UPLOAD_URL_PREFIX = '/static/uploads/'
+
+def references_query(cutoff):
+    """One UNION ALL over every column that can point at an upload: (kind, value, source)"""
+    def paths(column):
+        return db.select(db.literal('path'), column, db.null()).where(column.isnot(None))
+
+    def hashes(column, *where):
+        return db.select(db.literal('hash'), column, db.null()).where(column.isnot(None), *where)
+
+    return db.union_all(
+        paths(Project.image_url),
+        paths(ProjectMedia.file_url),
+        paths(Service.image_url),
+        paths(Testimonial.image_url),
+        paths(LuckyDrawTicket.payment_screenshot),
+        paths(PaymentSettings.qr_code_image),
+        paths(PropertyDocument.file_url),
+        hashes(Project.image_hash),
+        hashes(ProjectMedia.file_hash),
+        hashes(Service.image_hash),
+        hashes(PaymentSettings.qr_code_hash),
+        hashes(PropertyDocument.file_hash),
+        # Screenshots a ticket still uses, or too new to be collected by collect_screenshots
+        hashes(PaymentScreenshot.image_hash, db.or_(
+            PaymentScreenshot.created_at >= cutoff,
+            PaymentScreenshot.id.in_(db.select(LuckyDrawTicket.payment_screenshot_id)
+                                     .where(LuckyDrawTicket.payment_screenshot_id.isnot(None))))),
+        db.select(db.literal('derivative'), MediaDerivative.blob_hash, MediaDerivative.source_hash),
+    )
+
+def load_references(cutoff):
+    """Stream the references query into sets of used paths and hashes"""
+    referenced_paths = set()
+    referenced_hashes = set()
+    derivative_sources = defaultdict(set)  # derivative blob -> blobs it was rendered from
+    rows = db.session.execute(references_query(cutoff), execution_options={'yield_per': 1000})
+    for kind, value, source in rows:
+        if kind == 'path':
+            referenced_paths.add(value)
+        elif kind == 'hash':
+            referenced_hashes.add(value)
+        else:
+            derivative_sources[value].add(source)
+
+    # A derivative is in use while the image it was rendered from is
+    for blob_hash, sources in derivative_sources.items():
+        if sources & referenced_hashes:
+            referenced_hashes.add(blob_hash)
+    return referenced_paths, referenced_hashes, derivative_sources
+
+def collect_files(referenced_paths, cutoff, dry_run):
+    folder = app.config['UPLOAD_FOLDER']
+    if not os.path.isdir(folder):
+        return 0, 0
+    cutoff = cutoff.replace(tzinfo=timezone.utc)
+    count = reclaimed = 0
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file() \
+                    or UPLOAD_URL_PREFIX + entry.name in referenced_paths:
+                continue
+            stat = entry.stat()
+            if datetime.fromtimestamp(stat.st_mtime, timezone.utc) >= cutoff:
+                continue
+            if not dry_run:
+                os.remove(entry.path)
+            count += 1
+            reclaimed += stat.st_size
+    return count, reclaimed
+
+def collect_screenshots(cutoff, dry_run):
+    """Payment screenshot rows whose tickets were all deleted"""
+    orphans = db.select(PaymentScreenshot.id).where(
+        PaymentScreenshot.created_at < cutoff,
+        ~db.exists().where(LuckyDrawTicket.payment_screenshot_id == PaymentScreenshot.id)
+    )
+    if dry_run:
+        return db.session.scalar(db.select(db.func.count()).select_from(orphans.subquery()))
+    count = db.session.execute(
+        db.delete(PaymentScreenshot).where(PaymentScreenshot.id.in_(orphans)),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.commit()
+    return count
+
+def collect_upload_sessions(cutoff, dry_run):
+    """Abandoned (or long finished) resumable uploads, and their partial files"""
+    upload_ids = db.session.scalars(
+        db.select(UploadSession.id).where(UploadSession.updated_at < cutoff)
+    ).all()
+    reclaimed = 0
+    for upload_id in upload_ids:
+        path = resumable_upload_path(upload_id)
+        if os.path.exists(path):
+            reclaimed += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+    if upload_ids and not dry_run:
+        db.session.execute(
+            db.delete(UploadSession).where(UploadSession.id.in_(upload_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+    return len(upload_ids), reclaimed
+
+def delete_blobs(hashes):
+    """Delete each blob in its own savepoint, skipping any that a row started using
+    meanwhile. Commits every DELETE_BATCH_SIZE blobs; returns the hashes deleted."""
+    deleted = []
+    for start in range(0, len(hashes), DELETE_BATCH_SIZE):
+        for sha256 in hashes[start:start + DELETE_BATCH_SIZE]:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(
+                        db.delete(MediaBlob).where(MediaBlob.sha256 == sha256),
+                        execution_options={'synchronize_session': False}
+                    )
+                deleted.append(sha256)
+            except IntegrityError:
+                print(f"⚠️ Blob {sha256} is in use again, kept")
+        db.session.commit()
+    return deleted
+
+def collect_blobs(referenced_hashes, derivative_sources, cutoff, dry_run):
+    orphans = {}
+    rows = db.session.execute(
+        db.select(MediaBlob.sha256, MediaBlob.size).where(MediaBlob.created_at < cutoff),
+        execution_options={'yield_per': 1000}
+    )
+    for sha256, size in rows:
+        if sha256 not in referenced_hashes:
+            orphans[sha256] = size
+
+    # Sources first (their derivative rows cascade), then derivatives no surviving source uses
+    sources = [sha256 for sha256 in orphans if sha256 not in derivative_sources]
+    if not dry_run:
+        sources = delete_blobs(sources)
+    deleted_sources = set(sources)
+    derivatives = [sha256 for sha256 in orphans
+                   if sha256 in derivative_sources and derivative_sources[sha256] <= deleted_sources]
+    if not dry_run:
+        derivatives = delete_blobs(derivatives)
+    return len(sources) + len(derivatives), sum(orphans[sha256] for sha256 in sources + derivatives)
+
+def format_size(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+def run(dry_run=False, grace_hours=GRACE_HOURS):
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(hours=grace_hours)
+        mode = "Dry run, nothing will be deleted" if dry_run else "Deleting"
+        print(f"🧹 Upload GC: {mode} (grace period {grace_hours} hours)")
+        try:
+            screenshots = collect_screenshots(cutoff, dry_run)
+            print(f"{'🔎' if dry_run else '🗑️'} {screenshots} orphaned payment screenshot row(s)")
+
+            referenced_paths, referenced_hashes, derivative_sources = load_references(cutoff)
+
+            uploads, upload_bytes = collect_upload_sessions(cutoff, dry_run)
+            print(f"{'🔎' if dry_run else '🗑️'} {uploads} stale upload session(s), {format_size(upload_bytes)}")
+
+            files, file_bytes = collect_files(referenced_paths, cutoff, dry_run)
+            print(f"{'🔎' if dry_run else '🗑️'} {files} file(s) in {app.config['UPLOAD_FOLDER']}, {format_size(file_bytes)}")
+
+            blobs, blob_bytes = collect_blobs(referenced_hashes, derivative_sources, cutoff, dry_run)
+            print(f"{'🔎' if dry_run else '🗑️'} {blobs} media blob(s), {format_size(blob_bytes)}")
+
+            verb = "Would reclaim" if dry_run else "Reclaimed"
+            print(f"✅ {verb} {format_size(upload_bytes + file_bytes + blob_bytes)}")
+        except Exception as e:
+            print(f"❌ Upload GC failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    grace_hours = int(args[args.index('--grace-hours') + 1]) if '--grace-hours' in args else GRACE_HOURS
+    run(dry_run='--dry-run' in args, grace_hours=grace_hours)
@@ -3,7 +3,7 @@ Database initialization and seeding script for SSHC Construction Website
 Run this script to populate the database with sample data
 """
 
-from app import app, db
+from app import app, db, update_project_categories
 from models import User, Project, Service, Testimonial, CompanyInfo
 from datetime import datetime, date
 
@@ -154,6 +154,7 @@ def init_database():
                 )
             ]
             db.session.add_all(projects)
+            update_project_categories((None, project.category) for project in projects)
         
         # Add sample testimonials
         if Testimonial.query.count() == 0:
@@ -0,0 +1,29 @@
+"""
+Migration script to add the cache_versions table
+Change counters that tell every web worker when its cached site settings are out of date.
+"""
+from app import app, db
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            inspector = db.inspect(db.engine)
+            if 'cache_versions' not in inspector.get_table_names():
+                print("🗂️ Creating cache_versions table...")
+                db.create_all()
+                print("✅ cache_versions table created successfully")
+            else:
+                print("✓ cache_versions table already exists")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
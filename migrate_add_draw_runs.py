@@ -0,0 +1,30 @@
+"""
+Migration script to add the lucky_draw_runs table (commit-reveal draws)
+"""
+from app import app, db
+from models import LuckyDrawRun
+
+def migrate():
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            existing_tables = inspector.get_table_names()
+            
+            print("🔄 Starting migration...")
+            
+            if 'lucky_draw_runs' not in existing_tables:
+                print("🏆 Creating lucky_draw_runs table...")
+                db.create_all()
+                print("✅ lucky_draw_runs table created successfully")
+            else:
+                print("✓ lucky_draw_runs table already exists")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
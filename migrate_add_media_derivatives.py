@@ -0,0 +1,30 @@
+"""
+Migration script to add the media_derivatives table
+Holds the resized WebP/JPEG copies of uploaded images used for srcset.
+Images uploaded before this have no derivatives and are served at full size.
+"""
+from app import app, db
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            inspector = db.inspect(db.engine)
+            if 'media_derivatives' not in inspector.get_table_names():
+                print("🖼️ Creating media_derivatives table...")
+                db.create_all()
+                print("✅ media_derivatives table created successfully")
+            else:
+                print("✓ media_derivatives table already exists")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
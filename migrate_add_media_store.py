@@ -0,0 +1,55 @@
+"""
+Migration script to add the content-addressed media store
+Creates the media_blobs table (file content keyed by SHA-256, served from /media/<hash>)
+and adds a hash column next to every base64 column. New uploads only fill the hash
+columns; existing base64 values keep working until they are moved across.
+"""
+from app import app, db
+from sqlalchemy import text
+
+HASH_COLUMNS = [
+    ('projects', 'image_hash'),
+    ('project_media', 'file_hash'),
+    ('services', 'image_hash'),
+    ('payment_screenshots', 'image_hash'),
+    ('payment_settings', 'qr_code_hash'),
+    ('property_documents', 'file_hash'),
+]
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            inspector = db.inspect(db.engine)
+            if 'media_blobs' not in inspector.get_table_names():
+                print("🗄️ Creating media_blobs table...")
+                db.create_all()
+                print("✅ media_blobs table created successfully")
+            else:
+                print("✓ media_blobs table already exists")
+            
+            for table, column in HASH_COLUMNS:
+                db.session.execute(text(f"""
+                    ALTER TABLE {table}
+                    ADD COLUMN IF NOT EXISTS {column} VARCHAR(64) REFERENCES media_blobs(sha256);
+                """))
+                print(f"✓ {table}.{column} column ready")
+            
+            # Screenshots stored in media_blobs have no base64 copy
+            db.session.execute(text("""
+                ALTER TABLE payment_screenshots ALTER COLUMN image_base64 DROP NOT NULL;
+            """))
+            db.session.commit()
+            print("✓ payment_screenshots.image_base64 is now optional")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,31 @@
+"""
+Migration script to add the notification_outbox table
+Queued SMS/email are sent by notification_worker.py
+"""
+from app import app, db
+from models import NotificationOutbox
+
+def migrate():
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            existing_tables = inspector.get_table_names()
+            
+            print("🔄 Starting migration...")
+            
+            if 'notification_outbox' not in existing_tables:
+                print("📬 Creating notification_outbox table...")
+                db.create_all()
+                print("✅ notification_outbox table created successfully")
+            else:
+                print("✓ notification_outbox table already exists")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,41 @@
+"""
+Migration script for the lazy-loaded project gallery
+Adds image pixel sizes to media_blobs (filled in as derivatives are rendered) and the
+project_media index used to page through a project's gallery.
+The index is built CONCURRENTLY so the site stays up while it builds.
+"""
+from app import app, db
+from sqlalchemy import text
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            db.session.execute(text("""
+                ALTER TABLE media_blobs ADD COLUMN IF NOT EXISTS width INTEGER;
+                ALTER TABLE media_blobs ADD COLUMN IF NOT EXISTS height INTEGER;
+            """))
+            # Gallery cursors are (order, id) pairs, so order can't be NULL
+            result = db.session.execute(text('UPDATE project_media SET "order" = 0 WHERE "order" IS NULL'))
+            db.session.commit()
+            print(f"✓ media_blobs width/height columns ready, {result.rowcount} media order(s) set")
+            
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text("""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_project_media_project_type_order_id
+                    ON project_media (project_id, file_type, "order", id)
+                """))
+            print("✓ ix_project_media_project_type_order_id index ready")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,62 @@
+"""
+Migration script to add the projects page indexes and the project_categories table
+(keyset pagination on created_at/id with an optional category, featured projects
+on the home page, and per category counts for the filter buttons).
+Indexes are built CONCURRENTLY; the category counts are rebuilt from projects in a
+single GROUP BY, after that the app keeps them up to date on every project change.
+"""
+from app import app, db
+from models import ProjectCategory
+from sqlalchemy import text
+
+INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_projects_created_at_id ON projects (created_at, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_projects_category_created_at_id ON projects (category, created_at, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_projects_featured ON projects (featured)",
+]
+
+def migrate():
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            existing_tables = inspector.get_table_names()
+            
+            print("🔄 Starting migration...")
+            
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                for statement in INDEXES:
+                    conn.execute(text(statement))
+                    print(f"✓ {statement.split(' IF NOT EXISTS ')[1].split(' ON ')[0]}")
+            
+            if 'project_categories' not in existing_tables:
+                print("🏷️ Creating project_categories table...")
+                db.create_all()
+                print("✅ project_categories table created successfully")
+            else:
+                print("✓ project_categories table already exists")
+            
+            # The table may have been created empty by another script's create_all
+            if ProjectCategory.query.first():
+                print("✓ project_categories already filled")
+                return
+            
+            db.session.execute(text("""
+                INSERT INTO project_categories (category, project_count, updated_at)
+                SELECT category, COUNT(*), NOW()
+                FROM projects
+                GROUP BY category
+            """))
+            db.session.commit()
+            print(f"✅ project_categories filled with {ProjectCategory.query.count()} categories")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
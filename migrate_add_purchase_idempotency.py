@@ -0,0 +1,47 @@
+"""
+Migration script to make lucky draw purchases idempotent
+Creates the lucky_draw_purchases table (unique form token and normalised
+transaction ID) and links tickets to the purchase that created them.
+Existing tickets are not backfilled, they simply have no purchase.
+"""
+from app import app, db
+from sqlalchemy import text
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            inspector = db.inspect(db.engine)
+            if 'lucky_draw_purchases' not in inspector.get_table_names():
+                print("🧾 Creating lucky_draw_purchases table...")
+                db.create_all()
+                print("✅ lucky_draw_purchases table created successfully")
+            else:
+                print("✓ lucky_draw_purchases table already exists")
+            
+            db.session.execute(text("""
+                ALTER TABLE lucky_draw_tickets
+                ADD COLUMN IF NOT EXISTS purchase_id INTEGER REFERENCES lucky_draw_purchases(id);
+            """))
+            db.session.commit()
+            print("✓ purchase_id column ready")
+            
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text("""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_lucky_draw_tickets_purchase_id
+                    ON lucky_draw_tickets (purchase_id)
+                """))
+            print("✓ ix_lucky_draw_tickets_purchase_id")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,65 @@
+"""
+Migration script to add the referral_summary table and refer_code index
+The summary is rebuilt from lucky_draw_tickets in a single GROUP BY; after that
+the app keeps it up to date on every ticket status change.
+"""
+from app import app, db
+from models import ReferralSummary
+from sqlalchemy import text
+
+def migrate():
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            existing_tables = inspector.get_table_names()
+            
+            print("🔄 Starting migration...")
+            
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text("""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_refer_code_status
+                    ON lucky_draw_tickets (refer_code, status, series_id)
+                """))
+            print("✓ ix_tickets_refer_code_status index ready")
+            
+            if 'referral_summary' not in existing_tables:
+                print("🏆 Creating referral_summary table...")
+                db.create_all()
+                print("✅ referral_summary table created successfully")
+            else:
+                print("✓ referral_summary table already exists")
+            
+            # The table may have been created empty by another script's create_all
+            if ReferralSummary.query.first():
+                print("✓ referral_summary already filled")
+                return
+            
+            db.session.execute(text("""
+                INSERT INTO referral_summary (refer_code, total_tickets, pending_tickets, confirmed_tickets,
+                                              cancelled_tickets, confirmed_revenue, updated_at)
+                SELECT t.refer_code,
+                       COUNT(*),
+                       COUNT(*) FILTER (WHERE t.status = 'pending'),
+                       COUNT(*) FILTER (WHERE t.status = 'confirmed'),
+                       COUNT(*) FILTER (WHERE t.status = 'cancelled'),
+                       COALESCE(SUM(s.ticket_price) FILTER (WHERE t.status = 'confirmed'), 0),
+                       NOW()
+                FROM lucky_draw_tickets t
+                JOIN lucky_draw_series s ON s.id = t.series_id
+                WHERE t.refer_code IS NOT NULL AND t.refer_code <> ''
+                GROUP BY t.refer_code
+            """))
+            db.session.commit()
+            print(f"✅ referral_summary filled with {ReferralSummary.query.count()} refer code(s)")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,35 @@
+"""
+Migration script to add indexes for the admin lucky draw ticket list
+(keyset pagination on purchase_date/id with status, series and phone filters)
+Indexes are built CONCURRENTLY so ticket sales are not blocked while they build.
+"""
+from app import app, db
+from sqlalchemy import text
+
+INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_purchase_date_id ON lucky_draw_tickets (purchase_date, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_status_purchase_date_id ON lucky_draw_tickets (status, purchase_date, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_series_purchase_date_id ON lucky_draw_tickets (series_id, purchase_date, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_customer_phone ON lucky_draw_tickets (customer_phone varchar_pattern_ops)",
+]
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Adding lucky_draw_tickets indexes...")
+            
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                for statement in INDEXES:
+                    conn.execute(text(statement))
+                    print(f"✓ {statement.split(' IF NOT EXISTS ')[1].split(' ON ')[0]}")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,46 @@
+"""
+Migration script to add the lucky_draw_number_pool table
+Fills each series' pool with the ticket numbers not yet used by a ticket
+"""
+from app import app, db, build_number_pool
+from models import LuckyDrawSeries, LuckyDrawNumberPool
+
+def migrate():
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            existing_tables = inspector.get_table_names()
+            
+            print("🔄 Starting migration...")
+            
+            if 'lucky_draw_number_pool' not in existing_tables:
+                print("🎫 Creating lucky_draw_number_pool table...")
+                db.create_all()
+                print("✅ lucky_draw_number_pool table created successfully")
+            else:
+                print("✓ lucky_draw_number_pool table already exists")
+            
+            # Only fill pools for series that have never been pooled. Explicit columns, since
+            # columns added to the model by later migrations don't exist yet at this point
+            all_series = db.session.execute(
+                db.select(LuckyDrawSeries.id, LuckyDrawSeries.series_name, LuckyDrawSeries.total_tickets)
+                .order_by(LuckyDrawSeries.series_name)
+            ).all()
+            for series in all_series:
+                if LuckyDrawNumberPool.query.filter_by(series_id=series.id).first():
+                    print(f"✓ Series {series.series_name} pool already filled")
+                    continue
+                count = build_number_pool(series)
+                db.session.commit()
+                print(f"✅ Series {series.series_name}: {count} free numbers added to pool")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
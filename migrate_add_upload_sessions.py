@@ -0,0 +1,30 @@
+"""
+Migration script to add the upload_sessions and upload_chunks tables
+Used by the resumable, chunked upload endpoints for large project videos.
+"""
+from app import app, db
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            inspector = db.inspect(db.engine)
+            tables = inspector.get_table_names()
+            if 'upload_sessions' not in tables or 'upload_chunks' not in tables:
+                print("📤 Creating upload_sessions and upload_chunks tables...")
+                db.create_all()
+                print("✅ Upload session tables created successfully")
+            else:
+                print("✓ Upload session tables already exist")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,51 @@
+"""
+Migration script to split media store content into chunks
+Creates the media_chunks table and moves any media_blobs.data content into
+1MB chunks (done in SQL, so nothing is loaded into Python), then drops the
+data column. Uploads and /media responses then stream one chunk at a time.
+"""
+from app import app, db, MEDIA_CHUNK_SIZE
+from sqlalchemy import text
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            inspector = db.inspect(db.engine)
+            if 'media_chunks' not in inspector.get_table_names():
+                print("🧩 Creating media_chunks table...")
+                db.create_all()
+                print("✅ media_chunks table created successfully")
+            else:
+                print("✓ media_chunks table already exists")
+            
+            db.session.execute(text("ALTER TABLE media_blobs ALTER COLUMN size TYPE BIGINT;"))
+            
+            columns = [col['name'] for col in inspector.get_columns('media_blobs')]
+            if 'data' in columns:
+                print("📦 Splitting stored media into chunks...")
+                result = db.session.execute(text("""
+                    INSERT INTO media_chunks (sha256, seq, data)
+                    SELECT b.sha256, g.seq, substring(b.data FROM g.seq * :size + 1 FOR :size)
+                    FROM media_blobs b,
+                         generate_series(0, GREATEST(length(b.data) - 1, 0) / :size) AS g(seq)
+                    WHERE b.data IS NOT NULL
+                    ON CONFLICT DO NOTHING;
+                """), {'size': MEDIA_CHUNK_SIZE})
+                db.session.execute(text("ALTER TABLE media_blobs DROP COLUMN data;"))
+                print(f"✅ {result.rowcount} chunk(s) written, media_blobs.data dropped")
+            else:
+                print("✓ media_blobs.data already moved")
+            
+            db.session.commit()
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,74 @@
+"""
+Migration script to freeze lucky draw series once a draw commits to them
+Adds lucky_draw_series.frozen_at, lucky_draw_runs.draw_seed and the lucky_draw_run_tickets
+table holding the ticket list each draw ran on.
+Series of existing draws are frozen, and draws run before this migration get their
+ticket list recorded from the confirmed tickets as they are now.
+"""
+from app import app, db
+from sqlalchemy import text
+
+def migrate():
+    with app.app_context():
+        try:
+            existing_tables = db.inspect(db.engine).get_table_names()
+            
+            print("🔄 Starting migration...")
+            
+            if 'lucky_draw_series' not in existing_tables:
+                print("✓ lucky_draw_series doesn't exist yet, init_db.py creates it with frozen_at")
+                return
+            db.session.execute(text("ALTER TABLE lucky_draw_series ADD COLUMN IF NOT EXISTS frozen_at TIMESTAMP"))
+            db.session.commit()
+            print("✓ lucky_draw_series.frozen_at ready")
+            
+            # Runs before migrate_add_draw_runs.py, whose create_all builds both tables
+            # complete on a database that has never had draws
+            if 'lucky_draw_runs' not in existing_tables:
+                print("✓ No lucky_draw_runs table yet, nothing to freeze")
+                print("🎉 Migration completed successfully!")
+                return
+            
+            db.session.execute(text("""
+                ALTER TABLE lucky_draw_runs ADD COLUMN IF NOT EXISTS draw_seed VARCHAR(64);
+                CREATE TABLE IF NOT EXISTS lucky_draw_run_tickets (
+                    run_id INTEGER NOT NULL REFERENCES lucky_draw_runs (id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    ticket_number VARCHAR(20) NOT NULL,
+                    PRIMARY KEY (run_id, position)
+                );
+            """))
+            print("✓ draw_seed and lucky_draw_run_tickets ready")
+            
+            runs = db.session.execute(text("SELECT id, series_ids, created_at FROM lucky_draw_runs")).all()
+            frozen = 0
+            for run_id, series_ids, created_at in runs:
+                frozen += db.session.execute(text("""
+                    UPDATE lucky_draw_series SET frozen_at = :created_at, active = false
+                    WHERE id = ANY(:series_ids) AND frozen_at IS NULL
+                """), {'created_at': created_at,
+                       'series_ids': [int(series_id) for series_id in series_ids.split(',')]}).rowcount
+            print(f"✓ {frozen} series of existing draws frozen")
+            
+            recorded = db.session.execute(text("""
+                INSERT INTO lucky_draw_run_tickets (run_id, position, ticket_number)
+                SELECT r.id, row_number() OVER (PARTITION BY r.id ORDER BY t.ticket_number) - 1, t.ticket_number
+                FROM lucky_draw_runs r
+                JOIN lucky_draw_tickets t
+                  ON t.series_id = ANY(string_to_array(r.series_ids, ',')::int[]) AND t.status = 'confirmed'
+                WHERE r.status = 'drawn'
+                  AND NOT EXISTS (SELECT 1 FROM lucky_draw_run_tickets rt WHERE rt.run_id = r.id)
+            """)).rowcount
+            db.session.commit()
+            print(f"✓ {recorded} ticket(s) recorded for earlier draws")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
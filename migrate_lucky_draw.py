@@ -1,4 +1,4 @@
-from app import app, db
+from app import app, db, add_to_number_pool
 from models import LuckyDrawSeries, PaymentSettings
 
 def migrate_lucky_draw():
@@ -21,11 +21,12 @@ def migrate_lucky_draw():
             series = LuckyDrawSeries(
                 series_name=series_name,
                 total_tickets=5000,
-                available_tickets=5000,
                 ticket_price=999,
                 active=True
             )
             db.session.add(series)
+            db.session.flush()  # Get series ID
+            add_to_number_pool(series.id, range(1, series.total_tickets + 1))
         
         # Create default payment settings
         payment_settings = PaymentSettings(
@@ -0,0 +1,82 @@
+"""
+Migration script to move payment screenshots out of lucky_draw_tickets
+Creates the payment_screenshots table, adds lucky_draw_tickets.payment_screenshot_id
+and moves payment_screenshot_base64 data across in small batches (each batch is its
+own short transaction, so the ticket table is never locked for long).
+Safe to re-run: tickets that were already moved are skipped.
+"""
+import sys
+from app import app, db
+from models import PaymentScreenshot
+from sqlalchemy import text
+
+BATCH_SIZE = 200
+
+def migrate(batch_size=BATCH_SIZE):
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+
+            inspector = db.inspect(db.engine)
+            if 'payment_screenshots' not in inspector.get_table_names():
+                print("🖼️ Creating payment_screenshots table...")
+                db.create_all()
+                print("✅ payment_screenshots table created successfully")
+            else:
+                print("✓ payment_screenshots table already exists")
+
+            db.session.execute(text("""
+                ALTER TABLE lucky_draw_tickets
+                ADD COLUMN IF NOT EXISTS payment_screenshot_id INTEGER REFERENCES payment_screenshots(id);
+            """))
+            db.session.commit()
+            print("✓ payment_screenshot_id column ready")
+
+            columns = [col['name'] for col in inspector.get_columns('lucky_draw_tickets')]
+            if 'payment_screenshot_base64' not in columns:
+                print("✓ No payment_screenshot_base64 column, nothing to move")
+                return
+
+            moved = 0
+            last_id = 0
+            while True:
+                rows = db.session.execute(text("""
+                    SELECT id, payment_screenshot_base64 FROM lucky_draw_tickets
+                    WHERE id > :last_id
+                      AND payment_screenshot_id IS NULL
+                      AND payment_screenshot_base64 IS NOT NULL
+                      AND payment_screenshot_base64 <> ''
+                    ORDER BY id
+                    LIMIT :batch_size
+                """), {'last_id': last_id, 'batch_size': batch_size}).all()
+                if not rows:
+                    break
+
+                for ticket_id, image_base64 in rows:
+                    screenshot = PaymentScreenshot(image_base64=image_base64)
+                    db.session.add(screenshot)
+                    db.session.flush()  # Get screenshot ID
+                    db.session.execute(text("""
+                        UPDATE lucky_draw_tickets
+                        SET payment_screenshot_id = :screenshot_id, payment_screenshot_base64 = NULL
+                        WHERE id = :ticket_id
+                    """), {'screenshot_id': screenshot.id, 'ticket_id': ticket_id})
+
+                db.session.commit()
+                db.session.expunge_all()  # Don't keep moved images in memory
+                last_id = rows[-1][0]
+                moved += len(rows)
+                print(f"   Moved {moved} screenshot(s) (up to ticket {last_id})")
+
+            print(f"✅ {moved} payment screenshot(s) moved")
+            print("🎉 Migration completed successfully!")
+
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            db.session.rollback()
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+
+if __name__ == '__main__':
+    migrate()
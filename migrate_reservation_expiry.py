@@ -0,0 +1,37 @@
+"""
+Migration script for lucky draw reservation expiry
+Replaces the unique constraint on lucky_draw_tickets.ticket_number with a unique
+index that ignores expired tickets, so an expired reservation's number can be sold again.
+"""
+from app import app, db
+from sqlalchemy import text
+
+def migrate():
+    with app.app_context():
+        try:
+            print("🔄 Starting migration...")
+            
+            # CREATE INDEX CONCURRENTLY can't run inside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text("""
+                    CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_tickets_ticket_number_active
+                    ON lucky_draw_tickets (ticket_number) WHERE status <> 'expired'
+                """))
+                print("✓ uq_tickets_ticket_number_active index ready")
+                
+                # Drop the old full unique constraint only once the new index exists
+                conn.execute(text("""
+                    ALTER TABLE lucky_draw_tickets
+                    DROP CONSTRAINT IF EXISTS lucky_draw_tickets_ticket_number_key
+                """))
+                print("✓ Old ticket_number unique constraint removed")
+            
+            print("🎉 Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            import traceback
+            traceback.print_exc()
+
+if __name__ == '__main__':
+    migrate()
@@ -32,27 +32,52 @@ class Project(db.Model):
     client_name = db.Column(db.String(100))
     completion_date = db.Column(db.Date)
     image_url = db.Column(db.String(300))  # Main/thumbnail image
-    image_base64 = db.Column(db.Text)  # Base64 encoded image (persistent)
+    image_base64 = db.Column(db.Text)  # Base64 encoded image (legacy, see image_hash)
+    image_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256'))  # Persistent image in the media store
     featured = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship with media files
     media = db.relationship('ProjectMedia', backref='project', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Keyset pagination of the projects page, newest first, with and without a category
+        db.Index('ix_projects_created_at_id', 'created_at', 'id'),
+        db.Index('ix_projects_category_created_at_id', 'category', 'created_at', 'id'),
+        db.Index('ix_projects_featured', 'featured'),
+    )
+    
     def __repr__(self):
         return f'<Project {self.title}>'
 
+class ProjectCategory(db.Model):
+    """Per category project counts for the projects page filter, updated with every project change"""
+    __tablename__ = 'project_categories'
+    
+    category = db.Column(db.String(50), primary_key=True)
+    project_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ProjectCategory {self.category} ({self.project_count})>'
+
 class ProjectMedia(db.Model):
     __tablename__ = 'project_media'
     
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
     file_url = db.Column(db.String(300), nullable=False)
-    file_base64 = db.Column(db.Text)  # Base64 encoded file (persistent for images)
+    file_base64 = db.Column(db.Text)  # Base64 encoded file (legacy, see file_hash)
+    file_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256'))  # Persistent file in the media store
     file_type = db.Column(db.String(20), nullable=False)  # 'image' or 'video'
     order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Keyset pagination of the project gallery API
+        db.Index('ix_project_media_project_type_order_id', 'project_id', 'file_type', 'order', 'id'),
+    )
+    
     def __repr__(self):
         return f'<ProjectMedia {self.file_type} for Project {self.project_id}>'
 
@@ -64,7 +89,8 @@ class Service(db.Model):
     description = db.Column(db.Text, nullable=False)
     icon = db.Column(db.String(50))
     image_url = db.Column(db.String(300))
-    image_base64 = db.Column(db.Text)  # Base64 encoded image (persistent)
+    image_base64 = db.Column(db.Text)  # Base64 encoded image (legacy, see image_hash)
+    image_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256'))  # Persistent image in the media store
     order = db.Column(db.Integer, default=0)
     active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -128,15 +154,16 @@ class LuckyDrawSeries(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     series_name = db.Column(db.String(50), unique=True, nullable=False)  # A, B, C, etc.
     total_tickets = db.Column(db.Integer, default=5000)
-    available_tickets = db.Column(db.Integer, default=5000)
     ticket_price = db.Column(db.Integer, default=999)
     active = db.Column(db.Boolean, default=True)
     draw_date = db.Column(db.DateTime)
     winner_ticket = db.Column(db.String(20))
+    frozen_at = db.Column(db.DateTime)  # Set when a draw commits to this series; no sales or ticket changes after
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationship
     tickets = db.relationship('LuckyDrawTicket', backref='series', lazy=True, cascade='all, delete-orphan')
+    free_numbers = db.relationship('LuckyDrawNumberPool', backref='series', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<LuckyDrawSeries {self.series_name}>'
@@ -145,7 +172,7 @@ class LuckyDrawTicket(db.Model):
     __tablename__ = 'lucky_draw_tickets'
     
     id = db.Column(db.Integer, primary_key=True)
-    ticket_number = db.Column(db.String(20), unique=True, nullable=False)  # e.g., A-0001
+    ticket_number = db.Column(db.String(20), nullable=False)  # e.g., A-0001, unique unless expired
     series_id = db.Column(db.Integer, db.ForeignKey('lucky_draw_series.id'), nullable=False)
     customer_name = db.Column(db.String(100), nullable=False)
     customer_email = db.Column(db.String(120), nullable=True)  # Made optional for SMS-only flow
@@ -155,21 +182,246 @@ class LuckyDrawTicket(db.Model):
     payment_method = db.Column(db.String(20), default='upi')  # upi, qr
     transaction_id = db.Column(db.String(100))
     payment_screenshot = db.Column(db.String(300))  # File path (ephemeral on Render)
-    payment_screenshot_base64 = db.Column(db.Text)  # Base64 encoded image (persistent)
-    status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled
+    payment_screenshot_id = db.Column(db.Integer, db.ForeignKey('payment_screenshots.id'))  # Persistent image, loaded on demand
+    purchase_id = db.Column(db.Integer, db.ForeignKey('lucky_draw_purchases.id'), index=True)
+    status = db.Column(db.String(20), default='pending')  # pending, confirmed, cancelled, expired
     purchase_date = db.Column(db.DateTime, default=datetime.utcnow)
     confirmed_date = db.Column(db.DateTime)
     
+    # Indexes for the admin ticket list: keyset pages on (purchase_date, id), optionally filtered
+    __table_args__ = (
+        # Expired reservations give their number back to the pool, so they keep it without blocking reuse
+        db.Index('uq_tickets_ticket_number_active', 'ticket_number', unique=True, postgresql_where=db.text("status <> 'expired'")),
+        db.Index('ix_tickets_purchase_date_id', 'purchase_date', 'id'),
+        db.Index('ix_tickets_status_purchase_date_id', 'status', 'purchase_date', 'id'),
+        db.Index('ix_tickets_series_purchase_date_id', 'series_id', 'purchase_date', 'id'),
+        db.Index('ix_tickets_customer_phone', 'customer_phone', postgresql_ops={'customer_phone': 'varchar_pattern_ops'}),
+        db.Index('ix_tickets_refer_code_status', 'refer_code', 'status', 'series_id'),
+    )
+    
+    # Relationships
+    screenshot = db.relationship('PaymentScreenshot', lazy='select')
+    notifications = db.relationship('NotificationOutbox', backref='ticket', lazy='dynamic', cascade='all, delete-orphan', passive_deletes=True)
+    
     def __repr__(self):
         return f'<LuckyDrawTicket {self.ticket_number}>'
 
+class LuckyDrawRun(db.Model):
+    """A commit-reveal draw: the seed commitment is published before the draw, the seed after"""
+    __tablename__ = 'lucky_draw_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    series_ids = db.Column(db.String(500), nullable=False)  # Comma separated series IDs
+    winners_count = db.Column(db.Integer, default=1, nullable=False)
+    seed_commitment = db.Column(db.String(64), nullable=False)  # SHA-256 of the seed
+    seed = db.Column(db.String(64), nullable=False)  # Keep private until drawn
+    draw_seed = db.Column(db.String(64))  # SHA-256 of "<seed>:<tickets_digest>", the seed the winners are drawn with
+    status = db.Column(db.String(20), default='committed')  # committed, drawn
+    ticket_count = db.Column(db.Integer)  # Confirmed tickets that took part
+    tickets_digest = db.Column(db.String(64))  # SHA-256 of the ticket numbers in draw order, one per line
+    winner_tickets = db.Column(db.Text)  # Comma separated, in prize order
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    drawn_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<LuckyDrawRun {self.id} {self.status}>'
+
+class LuckyDrawRunTicket(db.Model):
+    """Ticket numbers that took part in a drawn run, copied at draw time in draw order"""
+    __tablename__ = 'lucky_draw_run_tickets'
+    
+    run_id = db.Column(db.Integer, db.ForeignKey('lucky_draw_runs.id', ondelete='CASCADE'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)  # 0-based index i in the draw
+    ticket_number = db.Column(db.String(20), nullable=False)
+
+class ReferralSummary(db.Model):
+    """Per refer code ticket counts, updated with every ticket status change"""
+    __tablename__ = 'referral_summary'
+    
+    refer_code = db.Column(db.String(50), primary_key=True)
+    total_tickets = db.Column(db.Integer, default=0, nullable=False)
+    pending_tickets = db.Column(db.Integer, default=0, nullable=False)
+    confirmed_tickets = db.Column(db.Integer, default=0, nullable=False)
+    cancelled_tickets = db.Column(db.Integer, default=0, nullable=False)
+    confirmed_revenue = db.Column(db.BigInteger, default=0, nullable=False)  # Sum of series ticket prices
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_referral_summary_leaderboard', 'confirmed_tickets', 'confirmed_revenue', 'refer_code'),
+    )
+    
+    def __repr__(self):
+        return f'<ReferralSummary {self.refer_code}>'
+
+class MediaBlob(db.Model):
+    """Uploaded file content, stored once and addressed by its SHA-256"""
+    __tablename__ = 'media_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)  # Hex digest of the content
+    mime_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    width = db.Column(db.Integer)  # Pixel size of images, recorded when their derivatives are rendered
+    height = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MediaBlob {self.sha256[:12]}>'
+
+class MediaChunk(db.Model):
+    """Content of a media blob, split so it can be written and served a piece at a time"""
+    __tablename__ = 'media_chunks'
+    
+    sha256 = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256', ondelete='CASCADE'), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)  # 0-based position of the chunk
+    data = db.Column(db.LargeBinary, nullable=False)
+    
+    def __repr__(self):
+        return f'<MediaChunk {self.sha256[:12]} #{self.seq}>'
+
+class MediaDerivative(db.Model):
+    """Resized, re-encoded copy of an image in the media store (for srcset)"""
+    __tablename__ = 'media_derivatives'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    source_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256', ondelete='CASCADE'), nullable=False)
+    width = db.Column(db.Integer, nullable=False)  # Requested width, capped at the source width
+    format = db.Column(db.String(10), nullable=False)  # webp or jpeg
+    blob_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256'), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('source_hash', 'width', 'format', name='uq_media_derivatives_source_width_format'),
+    )
+    
+    def __repr__(self):
+        return f'<MediaDerivative {self.source_hash[:12]} {self.width}w {self.format}>'
+
+class UploadSession(db.Model):
+    """Resumable, chunked upload of a large project video, assembled into ProjectMedia"""
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # Random token, also names the partial file
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    filename = db.Column(db.String(300), nullable=False)  # As sent by the browser
+    size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='uploading')  # uploading, assembling, complete, failed, rejected, lost
+    media_id = db.Column(db.Integer, db.ForeignKey('project_media.id', ondelete='SET NULL'))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+    
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.filename} {self.status}>'
+
+class UploadChunk(db.Model):
+    """A chunk of an upload session that has been written to the partial file"""
+    __tablename__ = 'upload_chunks'
+    
+    upload_id = db.Column(db.String(32), db.ForeignKey('upload_sessions.id', ondelete='CASCADE'), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True)  # 0-based chunk index
+    
+    def __repr__(self):
+        return f'<UploadChunk {self.upload_id} #{self.seq}>'
+
+class PaymentScreenshot(db.Model):
+    """Payment screenshot kept out of lucky_draw_tickets so ticket queries stay small"""
+    __tablename__ = 'payment_screenshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    image_base64 = db.Column(db.Text)  # Base64 data URI (legacy, see image_hash)
+    image_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256'))  # Persistent image in the media store
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PaymentScreenshot {self.id}>'
+
+class NotificationOutbox(db.Model):
+    """Customer notifications queued with the ticket change, sent by notification_worker.py"""
+    __tablename__ = 'notification_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('lucky_draw_tickets.id', ondelete='CASCADE'), nullable=False)
+    channel = db.Column(db.String(10), nullable=False)  # sms, email
+    event = db.Column(db.String(20), nullable=False)  # purchased, confirmed
+    status = db.Column(db.String(20), default='pending')  # pending, sent, skipped, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def __repr__(self):
+        return f'<NotificationOutbox {self.channel} {self.event} for Ticket {self.ticket_id}>'
+
+class LuckyDrawPurchase(db.Model):
+    """One purchase form submission, so a retried submission returns the original tickets"""
+    __tablename__ = 'lucky_draw_purchases'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    purchase_token = db.Column(db.String(64), unique=True)  # Random token generated by the purchase form
+    transaction_key = db.Column(db.String(100), unique=True)  # Normalised transaction ID / UTR
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationship
+    tickets = db.relationship('LuckyDrawTicket', backref='purchase', lazy=True)
+    
+    def __repr__(self):
+        return f'<LuckyDrawPurchase {self.id}>'
+
+class LuckyDrawNumberPool(db.Model):
+    """Free ticket numbers for a series, pre-shuffled via a random sort key"""
+    __tablename__ = 'lucky_draw_number_pool'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    series_id = db.Column(db.Integer, db.ForeignKey('lucky_draw_series.id', ondelete='CASCADE'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)
+    shuffle_key = db.Column(db.Integer, nullable=False)  # Random key, pool is read in this order
+    
+    __table_args__ = (
+        db.UniqueConstraint('series_id', 'number', name='uq_pool_series_number'),
+        db.Index('ix_pool_series_shuffle', 'series_id', 'shuffle_key'),
+    )
+    
+    def __repr__(self):
+        return f'<LuckyDrawNumberPool {self.series_id}:{self.number}>'
+
+# Free numbers left in the series' pool. Derived rather than stored, so buyers only take
+# pool rows and never update the series row: concurrent purchases don't queue on it.
+# (Older databases still have an available_tickets column; nothing reads it any more.)
+LuckyDrawSeries.available_tickets = db.column_property(
+    db.select(db.func.count(LuckyDrawNumberPool.id))
+    .where(LuckyDrawNumberPool.series_id == LuckyDrawSeries.id)
+    .correlate_except(LuckyDrawNumberPool)
+    .scalar_subquery()
+)
+
+class CacheVersion(db.Model):
+    """Change counter for data the web workers cache, bumped by the admin pages that edit it"""
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)  # e.g. settings
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name} v{self.version}>'
+
 class PaymentSettings(db.Model):
     __tablename__ = 'payment_settings'
     
     id = db.Column(db.Integer, primary_key=True)
     upi_id = db.Column(db.String(100))
     qr_code_image = db.Column(db.String(300))  # File path (ephemeral on Render)
-    qr_code_base64 = db.Column(db.Text)  # Base64 encoded image (persistent)
+    qr_code_base64 = db.Column(db.Text)  # Base64 encoded image (legacy, see qr_code_hash)
+    qr_code_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256'))  # Persistent image in the media store
     payment_instructions = db.Column(db.Text)
     lucky_draw_description = db.Column(db.Text)  # Description about the lucky draw
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -183,7 +435,8 @@ class PropertyDocument(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     file_url = db.Column(db.String(300), nullable=False)
-    file_base64 = db.Column(db.Text)  # Base64 encoded file (persistent for images)
+    file_base64 = db.Column(db.Text)  # Base64 encoded file (legacy, see file_hash)
+    file_hash = db.Column(db.String(64), db.ForeignKey('media_blobs.sha256'))  # Persistent file in the media store
     file_type = db.Column(db.String(50))  # pdf, jpg, png, etc.
     description = db.Column(db.Text)
     order = db.Column(db.Integer, default=0)
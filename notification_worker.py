@@ -0,0 +1,109 @@
+"""
+Notification worker - sends the SMS/email queued in notification_outbox
+Run alongside the web service:
+    python notification_worker.py          # keep polling
+    python notification_worker.py --once   # drain what is due and exit
+
+Set NOTIFICATION_TRANSPORT=console to print messages instead of sending them.
+Each batch is claimed and committed before anything is sent, so no row locks are held
+while waiting on Twilio or the mail server.
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+from app import app, db, send_ticket_sms, send_ticket_confirmation_email
+from models import NotificationOutbox
+
+def deliver(entry):
+    """Send one outbox entry, returns False if the channel is not configured.
+    
+    The default transport; process_batch takes any callable with the same contract,
+    which is how the tests swap in a fake one.
+    """
+    if entry.channel == 'sms':
+        return send_ticket_sms(entry.ticket, event=entry.event)
+    if entry.channel == 'email':
+        return send_ticket_confirmation_email(entry.ticket)
+    raise ValueError(f"Unknown notification channel: {entry.channel}")
+
+def claim_batch():
+    """Claim up to NOTIFICATION_BATCH_SIZE due entries and commit, returns their IDs.
+    
+    Claiming pushes next_attempt_at NOTIFICATION_CLAIM_TIMEOUT seconds ahead, so other
+    workers leave the entries alone while they are sent without holding any row locks.
+    If this worker dies mid-batch, the entries fall due again once the claim runs out.
+    """
+    now = datetime.utcnow()
+    # SKIP LOCKED lets several workers claim at the same time without taking the same rows
+    due = db.select(NotificationOutbox.id).where(
+        NotificationOutbox.status == 'pending',
+        NotificationOutbox.next_attempt_at <= now
+    ).order_by(NotificationOutbox.id).limit(
+        app.config['NOTIFICATION_BATCH_SIZE']
+    ).with_for_update(skip_locked=True)
+    claimed = db.session.execute(
+        db.update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(due))
+        .values(next_attempt_at=now + timedelta(seconds=app.config['NOTIFICATION_CLAIM_TIMEOUT']))
+        .returning(NotificationOutbox.id),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
+    db.session.commit()
+    return sorted(claimed)
+
+def record_failure(entry, error):
+    """Schedule a retry with exponential backoff, or give up after NOTIFICATION_MAX_ATTEMPTS"""
+    entry.attempts += 1
+    entry.last_error = f"{type(error).__name__}: {error}"
+    if entry.attempts >= app.config['NOTIFICATION_MAX_ATTEMPTS']:
+        entry.status = 'failed'
+        print(f"❌ Giving up on {entry} after {entry.attempts} attempts")
+    else:
+        # Exponential backoff: delay, 2x delay, 4x delay, ...
+        delay = app.config['NOTIFICATION_RETRY_DELAY'] * 2 ** (entry.attempts - 1)
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+def process_batch(transport=deliver):
+    """Send one batch of due notifications, returns how many were processed.
+    
+    Each result is committed as soon as it is known, so a crash part way through
+    only resends the entries that had not been sent yet.
+    """
+    claimed = claim_batch()
+    for entry_id in claimed:
+        entry = db.session.get(NotificationOutbox, entry_id)
+        if entry is None:
+            continue  # Its ticket was deleted meanwhile
+        try:
+            delivered = transport(entry)
+            entry.status = 'sent' if delivered else 'skipped'
+            entry.sent_at = datetime.utcnow()
+        except Exception as e:
+            db.session.rollback()  # Whatever the transport left in the session
+            entry = db.session.get(NotificationOutbox, entry_id)
+            if entry is None:
+                continue
+            record_failure(entry, e)
+        db.session.commit()
+    return len(claimed)
+
+def run(once=False, transport=deliver):
+    with app.app_context():
+        print(f"📬 Notification worker started (transport: {app.config['NOTIFICATION_TRANSPORT']})")
+        while True:
+            try:
+                processed = process_batch(transport)
+            except Exception as e:
+                print(f"❌ Notification batch failed: {e}")
+                db.session.rollback()
+                processed = 0
+
+            if processed:
+                print(f"✅ Processed {processed} notification(s)")
+                continue
+            if once:
+                break
+            time.sleep(app.config['NOTIFICATION_POLL_INTERVAL'])
+
+if __name__ == '__main__':
+    run(once='--once' in sys.argv)
@@ -0,0 +1,37 @@
+"""
+Reservation sweeper - expires pending lucky draw tickets older than RESERVATION_TTL_HOURS
+Their numbers return to the series pool and the available counts are restored.
+    python reservation_sweeper.py          # sweep every RESERVATION_SWEEP_INTERVAL seconds
+    python reservation_sweeper.py --once   # sweep once and exit (cron)
+"""
+import sys
+import time
+from app import app, db, expire_stale_reservations
+
+def sweep():
+    """Expire stale reservations batch by batch, each batch in its own short transaction"""
+    expired = 0
+    while True:
+        count = expire_stale_reservations()
+        expired += count
+        if count < app.config['RESERVATION_SWEEP_BATCH_SIZE']:
+            return expired
+
+def run(once=False):
+    with app.app_context():
+        print(f"⏳ Reservation sweeper started (TTL: {app.config['RESERVATION_TTL_HOURS']} hours)")
+        while True:
+            try:
+                expired = sweep()
+                if expired:
+                    print(f"✅ Expired {expired} stale reservation(s)")
+            except Exception as e:
+                print(f"❌ Reservation sweep failed: {e}")
+                db.session.rollback()
+
+            if once:
+                break
+            time.sleep(app.config['RESERVATION_SWEEP_INTERVAL'])
+
+if __name__ == '__main__':
+    run(once='--once' in sys.argv)
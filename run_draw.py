@@ -0,0 +1,71 @@
+"""
+Lucky draw command - commit, run and verify draws from the command line
+    python run_draw.py commit A,B --winners 1   # create a draw and freeze its series, prints the seed commitment
+    python run_draw.py draw <draw_id>           # record the ticket list, pick and record the winners
+    python run_draw.py verify <draw_id>         # re-run a finished draw from its published seed
+
+The ticket list is copied into lucky_draw_run_tickets at draw time and streamed
+from there in chunks, so memory stays constant however many tickets take part.
+"""
+import sys
+from app import app, db, create_draw_run, execute_draw, verify_draw
+from models import LuckyDrawSeries, LuckyDrawRun
+
+def usage():
+    print(__doc__)
+    sys.exit(1)
+
+def main(args):
+    if len(args) < 2:
+        usage()
+    command = args[0]
+
+    with app.app_context():
+        if command == 'commit':
+            names = [name.strip().upper() for name in args[1].split(',') if name.strip()]
+            series = LuckyDrawSeries.query.filter(LuckyDrawSeries.series_name.in_(names)).all()
+            if len(series) != len(names):
+                print(f"❌ Unknown series in: {', '.join(names)}")
+                sys.exit(1)
+            winners_count = int(args[args.index('--winners') + 1]) if '--winners' in args else 1
+            try:
+                run = create_draw_run([s.id for s in series], winners_count)
+            except ValueError as e:
+                print(f"❌ {e}")
+                sys.exit(1)
+            print(f"✅ Draw #{run.id} created for series {', '.join(names)}")
+            print(f"   Seed commitment (publish this now): {run.seed_commitment}")
+            return
+
+        run = LuckyDrawRun.query.get(int(args[1]))
+        if not run:
+            print(f"❌ Draw {args[1]} not found")
+            sys.exit(1)
+
+        if command == 'draw':
+            try:
+                winners = execute_draw(run)
+            except ValueError as e:
+                db.session.rollback()
+                print(f"❌ {e}")
+                sys.exit(1)
+            print(f"🎉 Draw #{run.id}: {run.ticket_count} confirmed tickets")
+            print(f"   Seed: {run.seed}")
+            print(f"   Tickets digest: {run.tickets_digest}")
+            print(f"   Draw seed: {run.draw_seed}")
+            for rank, ticket_number in enumerate(winners, start=1):
+                print(f"   Winner {rank}: {ticket_number}")
+        elif command == 'verify':
+            if run.status != 'drawn':
+                print(f"❌ Draw #{run.id} has not been drawn yet")
+                sys.exit(1)
+            if verify_draw(run):
+                print(f"✅ Draw #{run.id} verified: same tickets, same winners ({run.winner_tickets})")
+            else:
+                print(f"❌ Draw #{run.id} does NOT match the recorded result")
+                sys.exit(1)
+        else:
+            usage()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
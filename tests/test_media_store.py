@@ -0,0 +1,55 @@
+"""
+Media store: batched chunk writes, and completing a blob a dead worker left partly written
+"""
+import hashlib
+import io
+import secrets
+
+def read_blob(sha256):
+    from app import db
+    from models import MediaChunk
+
+    return b''.join(db.session.scalars(
+        db.select(MediaChunk.data).where(MediaChunk.sha256 == sha256).order_by(MediaChunk.seq)
+    ))
+
+class DiesAfter(io.BytesIO):
+    """A stream whose reader dies once `limit` bytes have been read"""
+    def __init__(self, data, limit):
+        super().__init__(data)
+        self.limit = limit
+
+    def read(self, size=-1):
+        if self.tell() >= self.limit:
+            raise RuntimeError('worker died')
+        return super().read(size)
+
+def test_partly_written_blob_is_completed(flask_app, monkeypatch):
+    import app as app_module
+    from app import db, write_media_chunks
+    from models import MediaBlob, MediaChunk
+
+    monkeypatch.setattr(app_module, 'MEDIA_CHUNK_SIZE', 4)
+    data = secrets.token_bytes(4 * 5 + 2)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    with flask_app.app_context():
+        try:
+            # A worker that died after committing its first batch of three chunks
+            try:
+                write_media_chunks(sha256, 'video/mp4', len(data), DiesAfter(data, 4 * 3), commit_every=3)
+            except RuntimeError:
+                db.session.rollback()
+            assert read_blob(sha256) == data[:4 * 3]
+
+            assert write_media_chunks(sha256, 'video/mp4', len(data), io.BytesIO(data), commit_every=3) is False
+            db.session.commit()
+            assert read_blob(sha256) == data
+
+            # Complete content is not read again
+            assert write_media_chunks(sha256, 'video/mp4', len(data), DiesAfter(data, 0)) is False
+        finally:
+            db.session.rollback()
+            db.session.execute(db.delete(MediaChunk).where(MediaChunk.sha256 == sha256))
+            db.session.execute(db.delete(MediaBlob).where(MediaBlob.sha256 == sha256))
+            db.session.commit()
@@ -0,0 +1,129 @@
+"""
+Notification worker: sending, retries with backoff, giving up, and claiming without row locks.
+A fake transport stands in for Twilio and SMTP.
+"""
+import threading
+from datetime import datetime, timedelta
+import pytest
+
+class FakeTransport:
+    """Records the outbox entries it is asked to send; the first `failures` calls raise"""
+    def __init__(self, failures=0, during_send=None):
+        self.failures = failures
+        self.during_send = during_send
+        self.sent = []
+
+    def __call__(self, entry):
+        self.sent.append(entry.id)
+        if self.during_send:
+            self.during_send(entry)
+        if len(self.sent) <= self.failures:
+            raise ConnectionError('SMS gateway unavailable')
+        return True
+
+@pytest.fixture
+def entry_id(flask_app, make_series):
+    """One due SMS for a new pending ticket"""
+    from app import db
+    from models import LuckyDrawTicket, NotificationOutbox
+
+    series_id = make_series(1)
+    with flask_app.app_context():
+        ticket = LuckyDrawTicket(ticket_number='T-0001', series_id=series_id, customer_name='Test Buyer',
+                                 customer_phone='+910000000000', status='pending')
+        db.session.add(ticket)
+        db.session.flush()
+        entry = NotificationOutbox(ticket_id=ticket.id, channel='sms', event='purchased')
+        db.session.add(entry)
+        db.session.commit()
+        return entry.id
+
+def make_due(entry_id):
+    from app import db
+    from models import NotificationOutbox
+
+    db.session.execute(
+        db.update(NotificationOutbox).where(NotificationOutbox.id == entry_id)
+        .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.session.commit()
+
+def load(entry_id):
+    from app import db
+    from models import NotificationOutbox
+
+    db.session.expire_all()
+    return db.session.get(NotificationOutbox, entry_id)
+
+def test_due_entry_is_sent(flask_app, entry_id):
+    from notification_worker import process_batch
+
+    transport = FakeTransport()
+    with flask_app.app_context():
+        process_batch(transport)
+        entry = load(entry_id)
+        assert transport.sent.count(entry_id) == 1
+        assert entry.status == 'sent'
+        assert entry.sent_at is not None
+        assert entry.attempts == 0
+
+def test_failures_back_off_then_give_up(flask_app, entry_id, monkeypatch):
+    from notification_worker import process_batch
+
+    monkeypatch.setitem(flask_app.config, 'NOTIFICATION_MAX_ATTEMPTS', 3)
+    monkeypatch.setitem(flask_app.config, 'NOTIFICATION_RETRY_DELAY', 60)
+    transport = FakeTransport(failures=10)
+    with flask_app.app_context():
+        for attempt, delay in [(1, 60), (2, 120)]:
+            before = datetime.utcnow()
+            process_batch(transport)
+            entry = load(entry_id)
+            assert entry.status == 'pending'
+            assert entry.attempts == attempt
+            assert 'SMS gateway unavailable' in entry.last_error
+            assert before + timedelta(seconds=delay) <= entry.next_attempt_at \
+                <= datetime.utcnow() + timedelta(seconds=delay)
+            # Not due yet: a second batch leaves it alone
+            process_batch(transport)
+            assert transport.sent.count(entry_id) == attempt
+            make_due(entry_id)
+
+        process_batch(transport)
+        entry = load(entry_id)
+        assert entry.status == 'failed'
+        assert entry.attempts == 3
+
+        # Dead letter: never tried again
+        make_due(entry_id)
+        process_batch(transport)
+        assert transport.sent.count(entry_id) == 3
+
+def test_claimed_entries_are_sent_without_row_locks(flask_app, entry_id):
+    from app import db
+    from models import NotificationOutbox
+    from notification_worker import process_batch
+
+    seen_by_other_worker = {}
+
+    def other_worker():
+        with flask_app.app_context():
+            # NOWAIT fails at once if the sending worker still holds a lock on the row
+            seen_by_other_worker['locked'] = db.session.execute(
+                db.select(NotificationOutbox.id).where(NotificationOutbox.id == entry_id)
+                .with_for_update(nowait=True)
+            ).scalar()
+            db.session.rollback()
+            transport = FakeTransport()
+            process_batch(transport)
+            seen_by_other_worker['sent'] = transport.sent
+
+    def during_send(entry):
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        thread.join()
+
+    with flask_app.app_context():
+        process_batch(FakeTransport(during_send=during_send))
+        assert seen_by_other_worker['locked'] == entry_id
+        assert entry_id not in seen_by_other_worker['sent']
+        assert load(entry_id).status == 'sent'
@@ -0,0 +1,73 @@
+"""
+Page cache: each combination of the query arguments a view reads gets its own entry,
+anything else in the query string shares it
+"""
+import secrets
+import pytest
+
+def cache_keys():
+    from app import page_cache, page_cache_lock
+
+    with page_cache_lock:
+        return set(page_cache)
+
+def test_projects_category_and_cursor_are_cached_separately(flask_app):
+    client = flask_app.test_client()
+    category_a = f"Test {secrets.token_hex(4)}"
+    category_b = f"Test {secrets.token_hex(4)}"
+    cursor = '2000-01-01T00:00:00|1'
+
+    for query in ({'category': category_a}, {'category': category_b}, {'category': category_a, 'after': cursor}):
+        response = client.get('/projects', query_string=query)
+        assert response.status_code == 200
+        assert response.headers['X-Page-Cache'] == 'miss'
+
+    keys = cache_keys()
+    assert ('/projects', (category_a, None)) in keys
+    assert ('/projects', (category_b, None)) in keys
+    assert ('/projects', (category_a, cursor)) in keys
+
+    # Same page again, and with a query argument the view doesn't read
+    for query in ({'category': category_a}, {'category': category_a, 'utm_source': 'test'}):
+        response = client.get('/projects', query_string=query)
+        assert response.headers['X-Page-Cache'] == 'hit'
+
+@pytest.fixture
+def project_id(flask_app):
+    """A project with more gallery images than one page holds"""
+    from app import db, GALLERY_PAGE_SIZE
+    from models import Project, ProjectMedia
+
+    with flask_app.app_context():
+        project = Project(title='Gallery test', description='Gallery test', category='Test')
+        db.session.add(project)
+        db.session.flush()
+        db.session.add_all([
+            ProjectMedia(project_id=project.id, file_url=f"https://example.com/{order}.jpg",
+                         file_type='image', order=order)
+            for order in range(GALLERY_PAGE_SIZE + 5)
+        ])
+        db.session.commit()
+        created_id = project.id
+
+    yield created_id
+
+    with flask_app.app_context():
+        db.session.delete(db.session.get(Project, created_id))
+        db.session.commit()
+
+def test_gallery_pages_and_types_are_cached_separately(flask_app, project_id):
+    from app import GALLERY_PAGE_SIZE
+
+    client = flask_app.test_client()
+    url = f'/project/{project_id}/gallery'
+
+    first = client.get(url).get_json()
+    assert len(first['items']) == GALLERY_PAGE_SIZE
+    second = client.get(url, query_string={'after': first['next_cursor']}).get_json()
+    assert len(second['items']) == 5
+    assert second['next_cursor'] is None
+    assert not {item['id'] for item in first['items']} & {item['id'] for item in second['items']}
+
+    videos = client.get(url, query_string={'type': 'video'}).get_json()
+    assert videos['items'] == []
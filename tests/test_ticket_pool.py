@@ -0,0 +1,117 @@
+"""
+Concurrency tests for the ticket number pool: parallel buyers must never get the same number
+"""
+import secrets
+import threading
+
+TOTAL_TICKETS = 300
+THREADS = 8
+CLAIM_SIZE = 3
+
+def test_concurrent_claims_never_share_a_number(flask_app, make_series):
+    from app import db, claim_ticket_numbers
+    from models import LuckyDrawSeries, LuckyDrawNumberPool
+
+    app = flask_app
+    series_id = make_series(TOTAL_TICKETS)
+
+    claimed = []
+    lock = threading.Lock()
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def buyer(index):
+        try:
+            with app.app_context():
+                start.wait()
+                attempt = 0
+                while True:
+                    attempt += 1
+                    numbers = claim_ticket_numbers(series_id, CLAIM_SIZE)
+                    if not numbers:
+                        db.session.rollback()
+                        return
+                    if (index + attempt) % 5 == 0:
+                        # An abandoned purchase: its numbers must go back to the pool
+                        db.session.rollback()
+                        continue
+                    db.session.commit()
+                    with lock:
+                        claimed.extend(numbers)
+        except Exception as e:  # Reported from the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=buyer, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(claimed) == len(set(claimed)), 'a ticket number was sold twice'
+    assert sorted(claimed) == list(range(1, TOTAL_TICKETS + 1))
+    with app.app_context():
+        assert db.session.get(LuckyDrawSeries, series_id).available_tickets == 0
+        assert LuckyDrawNumberPool.query.filter_by(series_id=series_id).count() == 0
+
+PURCHASE_THREADS = 6
+PURCHASES_PER_THREAD = 5
+QUANTITY = 2
+
+def test_concurrent_purchases_never_share_a_number(flask_app, make_series):
+    from app import db
+    from models import LuckyDrawSeries, LuckyDrawTicket, LuckyDrawPurchase
+
+    total = PURCHASE_THREADS * PURCHASES_PER_THREAD * QUANTITY
+    series_id = make_series(total)
+
+    tokens = []
+    lock = threading.Lock()
+    errors = []
+    start = threading.Barrier(PURCHASE_THREADS)
+
+    def buyer(index):
+        try:
+            client = flask_app.test_client()
+            start.wait()
+            for attempt in range(PURCHASES_PER_THREAD):
+                token = secrets.token_hex(16)
+                response = client.post('/lucky-draw/purchase', data={
+                    'customer_name': f'Buyer {index}',
+                    'customer_email': f'buyer{index}@example.com',
+                    'customer_phone': f'+9190000000{index:02d}',
+                    'payment_method': 'upi',
+                    'transaction_id': f'TEST{token}',
+                    'purchase_token': token,
+                    'quantity': QUANTITY,
+                })
+                assert response.status_code == 302
+                with lock:
+                    tokens.append(token)
+        except Exception as e:  # Reported from the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=buyer, args=(index,)) for index in range(PURCHASE_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+    with flask_app.app_context():
+        purchase_ids = db.select(LuckyDrawPurchase.id).where(LuckyDrawPurchase.purchase_token.in_(tokens))
+        tickets = db.session.execute(
+            db.select(LuckyDrawTicket.ticket_number, LuckyDrawTicket.series_id)
+            .where(LuckyDrawTicket.purchase_id.in_(purchase_ids))
+        ).all()
+        try:
+            # Other active series in the database may take some of the purchases
+            assert len(tickets) == total
+            numbers = [ticket_number for ticket_number, _ in tickets]
+            assert len(numbers) == len(set(numbers)), 'a ticket number was sold twice'
+            sold_here = sum(1 for _, ticket_series_id in tickets if ticket_series_id == series_id)
+            assert db.session.get(LuckyDrawSeries, series_id).available_tickets == total - sold_here
+        finally:
+            db.session.execute(db.delete(LuckyDrawTicket).where(LuckyDrawTicket.purchase_id.in_(purchase_ids)))
+            db.session.execute(db.delete(LuckyDrawPurchase).where(LuckyDrawPurchase.purchase_token.in_(tokens)))
+            db.session.commit()